@@ -0,0 +1,42 @@
+import argparse
+import time
+
+from stateful import State
+
+from include import frame
+
+
+def load(idempotent, df, deliveries, bulk):
+    state = State("id", idempotent=idempotent)
+    events = df.to_dict("records") if not bulk else None
+
+    started = time.perf_counter()
+    for _ in range(deliveries):
+        if bulk:
+            state.include(df, columns=["amount", "status"])
+        else:
+            for event in events:
+                state.add(dict(event))
+    return state, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cost of the idempotent mode when every event is delivered again")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--keys", type=int, default=1_000)
+    parser.add_argument("--deliveries", type=int, default=3)
+    parser.add_argument("--single", action="store_true", help="load with State.add instead of State.include")
+    arguments = parser.parse_args()
+
+    df = frame(arguments.rows, arguments.keys)
+    total = arguments.rows * arguments.deliveries
+    for idempotent in (False, True):
+        state, elapsed = load(idempotent, df, arguments.deliveries, not arguments.single)
+        usage = state.memory_usage()
+        print(f"idempotent={idempotent}: {len(state)} events kept of {total}, {elapsed:.2f}s, "
+              f"{total / elapsed:,.0f} rows/s, {usage['total'].sum() / 2 ** 20:.1f} MiB, "
+              f"index {usage['index'].sum() / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from stateful import State
+
+
+def frame(rows, keys, seed=0, start=0):
+    rng = np.random.default_rng(seed)
+    seconds = start + rng.integers(10 ** 6, size=rows)
+    df = pd.DataFrame({
+        "id": rng.integers(keys, size=rows),
+        "date": pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(seconds, unit="s"),
+        "amount": rng.integers(1000, size=rows).astype(float),
+        "status": rng.choice(["open", "closed", "pending"], size=rows).astype(object)
+    })
+    df.loc[rng.random(rows) < 0.1, "amount"] = np.NaN
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rows per second loaded by State.include")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None, help="stream generated chunks through include_stream")
+    parser.add_argument("--strict", action="store_true", help="declare the dtypes and validate them per column")
+    arguments = parser.parse_args()
+
+    if arguments.strict:
+        state = State("id", configuration={"amount": {"dtype": "floating"}, "status": {"dtype": "category"}},
+                      strict=True)
+    else:
+        state = State("id")
+    if arguments.chunksize:
+        # chunks are generated lazily and cover consecutive time windows, the whole frame never exists at once
+        starts = range(0, arguments.rows, arguments.chunksize)
+        chunks = (frame(min(arguments.chunksize, arguments.rows - start), arguments.keys, seed, seed * 10 ** 6)
+                  for seed, start in enumerate(starts))
+        started = time.perf_counter()
+        state.include_stream(chunks, columns=["amount", "status"], workers=arguments.workers)
+    else:
+        df = frame(arguments.rows, arguments.keys)
+        started = time.perf_counter()
+        state.include(df, columns=["amount", "status"], workers=arguments.workers)
+    elapsed = time.perf_counter() - started
+
+    print(f"{arguments.rows} rows, {arguments.keys} keys, {arguments.workers or 1} workers, "
+          f"chunks of {arguments.chunksize or arguments.rows}, {elapsed:.2f}s, {arguments.rows / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
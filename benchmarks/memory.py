@@ -0,0 +1,50 @@
+import argparse
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from stateful import State
+
+STREAMS = ["a", "b", "c", "d", "e"]
+HOUR = pd.Timedelta(1, unit="h").value
+
+
+def peak_rss():
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def build(spaces, events, density, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.where(rng.random((events, len(STREAMS))) < density, rng.integers(100, size=(events, len(STREAMS))),
+                      np.NaN)
+    start = pd.Timestamp("2020-01-01", tz="UTC").value
+
+    state = State("id")
+    for id in range(spaces):
+        for event, row in enumerate(values[rng.permutation(events)].tolist()):
+            state.add({"id": id, "date": start + event * HOUR, **dict(zip(STREAMS, row))})
+
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="memory held by a state with many spaces and sparse streams")
+    parser.add_argument("--spaces", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=2)
+    parser.add_argument("--density", type=float, default=0.2)
+    arguments = parser.parse_args()
+
+    before, started = peak_rss(), time.perf_counter()
+    state = build(arguments.spaces, arguments.events, arguments.density)
+    elapsed, used = time.perf_counter() - started, peak_rss() - before
+
+    streams = sum(len(space.controller.streams) for space in state.all_spaces.values())
+    print(f"{arguments.spaces} spaces, {arguments.events} events each, {arguments.density:.0%} of the values filled")
+    print(f"{streams} streams, {used / 2 ** 20:.1f} MiB, {used / arguments.spaces:.0f} bytes per space, "
+          f"built in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import asyncio
+
+
+class MicroBatcher:
+    # events wait in a bounded queue and are applied in batches, a full queue makes the producers wait
+
+    def __init__(self, state, batch_size=4096, latency=0.005, max_pending=65536):
+        self.state = state
+        self.batch_size = batch_size
+        self.latency = latency
+        self.max_pending = max_pending
+
+        self._loop = None
+        self._queue = None
+        self._task = None
+        self._error = None
+
+    def _bind(self):
+        # the queue and the task belong to one event loop, a new loop starts them again
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(self.max_pending)
+            self._task = loop.create_task(self._run())
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def put(self, event: dict):
+        assert isinstance(event, dict), "Event has to be a dictionary"
+        self._raise()
+        self._bind()
+        await self._queue.put(event)
+
+    async def join(self):
+        self._bind()
+        await self._queue.join()
+        self._raise()
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = self._loop.time() + self.latency
+
+            while len(batch) < self.batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                self.state.add_many(batch)
+            except Exception as error:
+                # the producers see the error on their next put or flush
+                self._error = error
+            finally:
+                for _ in batch:
+                    queue.task_done()
@@ -3,6 +3,7 @@ from stateful.representable import Representable
 
 
 class EventBase(Representable):
+    __slots__ = ()
 
     def items(self):
         raise NotImplementedError("items() should be implemented by all children")
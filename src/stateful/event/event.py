@@ -6,6 +6,8 @@ from stateful.utils import list_of_instance
 
 
 class Event(EventBase):
+    __slots__ = ("date", "_state")
+
     def __init__(self, date, state=None):
         self.date = date
         self._state = state if state else {}
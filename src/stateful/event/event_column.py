@@ -1,20 +1,30 @@
 from datetime import datetime
 import numpy as np
+import pandas as pd
 from pandas import DatetimeIndex
-from stateful.utils import infer_dtype, list_of_instance
+from stateful.utils import infer_dtype, list_of_instance, cast_output_numpy, is_missing
+
+KIND_DTYPES = {"f": "floating", "i": "integer", "u": "integer", "b": "boolean"}
 
 
 class EventColumn:
+    __slots__ = ("name", "dates", "events", "dtype")
 
-    def __init__(self, name, dates: DatetimeIndex, events):
+    def __init__(self, name, dates: DatetimeIndex, events, dtype=None):
         assert len(dates) == len(events)
         self.name = name
         self.dates = dates
-        self.events = events if isinstance(events, np.ndarray) else events.events
-        try:
-            self.dtype = infer_dtype(self.events[~np.isnan(self.events)][0])
-        except:
-            self.dtype = None
+        self.events = events if isinstance(events, (np.ndarray, pd.Categorical)) else events.events
+        if dtype is not None:
+            # columns read from a stream know their dtype, only computed columns are inferred
+            self.dtype = dtype
+        elif isinstance(self.events, pd.Categorical):
+            self.dtype = "category"
+        elif self.events.dtype.kind in KIND_DTYPES:
+            self.dtype = KIND_DTYPES[self.events.dtype.kind]
+        else:
+            first = next((event for event in self.events if not is_missing(event)), None)
+            self.dtype = infer_dtype(first) if first is not None else None
 
     def apply(self, function):
         try:
@@ -27,15 +37,11 @@ class EventColumn:
     def cast(self, dtype=None):
         dtype = dtype if dtype else self.dtype
 
-        events = self.events
-        if dtype == "integer":
-            events = events.astype(int)
-        elif dtype == "boolean":
-            events = events.astype(bool)
-        else:
-            events = events
+        events = cast_output_numpy(dtype, self.events)
+        if events is self.events:
+            return self
 
-        return EventColumn(self.name, self.dates, events)
+        return EventColumn(self.name, self.dates, events, dtype=dtype)
 
     def __iter__(self):
         for date, event in zip(self.dates, self.events):
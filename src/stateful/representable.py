@@ -2,6 +2,7 @@ import pandas as pd
 
 
 class Representable:
+    __slots__ = ()
 
     @property
     def empty(self):
@@ -1,23 +1,47 @@
+import heapq
 from datetime import datetime
 
+from stateful.storage.arrays import to_nanosecond, to_nanoseconds, to_scalar
+from stateful.storage.stream import Stream
 from stateful.storage.stream_controller import StreamController
 from stateful.representable import Representable
+import numpy as np
 import pandas as pd
-from stateful.utils import list_of_instance
+from stateful.storage.base import MEMORY_COMPONENTS
+from stateful.storage.dedup import HashIndex, event_hash, event_hashes
+from stateful.utils import list_of_instance, shallow_size, container_size, is_missing
+
+SPACE_ROW = "(space)"
 
 
 class Space(Representable):
+    __slots__ = ("time_key", "primary_key", "primary_value", "_controller", "log", "_iter", "length", "window",
+                 "_pending", "_watermark", "_arrivals", "index")
 
-    def __init__(self, primary_key, primary_value, time_key, graph, configuration=None):
+    def __init__(self, primary_key, primary_value, time_key, graph, configuration=None, dictionaries=None, pool=None,
+                 window=None, idempotent=False):
         Representable.__init__(self)
         self.time_key = time_key
         self.primary_key = primary_key
         self.primary_value = primary_value
-        self.controller = StreamController(graph, configuration)
+        self._controller = StreamController(graph, configuration, dictionaries, pool)
+        self.log = None
         self._iter = None
-        self._prev = None
         self.length = 0
 
+        self.window = window
+        self._pending = None
+        self._watermark = None
+        self._arrivals = 0
+        self.index = HashIndex() if idempotent else None
+
+    @property
+    def controller(self):
+        # every read goes through the controller, so the events waiting for reordering are applied first
+        if self._pending:
+            self.release()
+        return self._controller
+
     @property
     def start(self):
         return self.controller.start
@@ -48,12 +72,101 @@ class Space(Representable):
     def add(self, event: dict):
         assert isinstance(event, dict), "Event has to be a dictionary"
         assert self.time_key in event, "Event has to include time key"
-        self.length += 1
+        date = to_nanosecond(event.pop(self.time_key))
+
+        hashes = None
+        if self.index is not None and event:
+            # a redelivered value is dropped, an event is only counted while one of its values is new
+            hashes = {key: event_hash(key, date, value) for key, value in event.items()}
+            event = {key: value for key, value in event.items() if hashes[key] not in self.index}
+            if not event:
+                return
+
+        # the event is logged before anything changes, an event the log rejects is not applied either
+        if self.log is not None:
+            self.log.append(to_scalar(self.primary_value), date, event)
 
-        date = event.pop(self.time_key)
+        if hashes is not None:
+            for key in event.keys():
+                self.index.add(hashes[key])
 
+        self.length += 1
+        if self.window is None:
+            self._apply(date, event)
+        else:
+            self._reorder(date, event)
+
+    def _apply(self, date, event):
+        streams = self._controller.streams
         for key, value in event.items():
-            self.controller[key].add(date, value)
+            stream = streams.get(key)
+            if stream is None:
+                # a stream only exists in the spaces that have seen a value for it
+                if is_missing(value):
+                    continue
+                stream = self._controller[key]
+            stream.add(date, value)
+
+    def _reorder(self, date, event):
+        # events within the window of the latest date wait in a heap and reach the streams in time order,
+        # older ones are backfilled into the streams right away
+        if self._watermark is None or date > self._watermark:
+            self._watermark = date
+        cutoff = self._watermark - self.window
+
+        if date < cutoff:
+            self._apply(date, event)
+            return
+
+        if self._pending is None:
+            self._pending = []
+        heapq.heappush(self._pending, (date, self._arrivals, event))
+        self._arrivals += 1
+
+        while self._pending and self._pending[0][0] < cutoff:
+            date, _, event = heapq.heappop(self._pending)
+            self._apply(date, event)
+
+    def release(self):
+        while self._pending:
+            date, _, event = heapq.heappop(self._pending)
+            self._apply(date, event)
+
+    def extend(self, dates, columns: dict):
+        # the bulk version of add, every column holds one value per date and missing values are skipped like in add
+        dates = to_nanoseconds(dates)
+        fresh, hashes = None, None
+        if self.index is not None and columns:
+            hashes = {key: event_hashes(key, dates, values) for key, values in columns.items()}
+            fresh = {key: self.index.unseen(column) for key, column in hashes.items()}
+            rows = np.logical_or.reduce(list(fresh.values()))
+            if not rows.all():
+                dates = dates[rows]
+                columns = {key: np.asarray(values)[rows] for key, values in columns.items()}
+                hashes = {key: column[rows] for key, column in hashes.items()}
+                fresh = {key: mask[rows] for key, mask in fresh.items()}
+
+        # the batch is logged before anything changes, a batch the log rejects is not applied either
+        if self.log is not None and len(dates):
+            self.log.append_many(to_scalar(self.primary_value), dates, columns)
+
+        if hashes is not None:
+            for key, column in hashes.items():
+                self.index.update(column[fresh[key]])
+
+        self.length += len(dates)
+        if self.window is not None and len(dates):
+            last = int(dates.max())
+            self._watermark = last if self._watermark is None else max(self._watermark, last)
+
+        streams = self.controller.streams
+        for key, values in columns.items():
+            column_dates = dates
+            if fresh is not None and not fresh[key].all():
+                column_dates, values = dates[fresh[key]], np.asarray(values)[fresh[key]]
+            if not len(column_dates) or key not in streams and pd.isna(values).all():
+                continue
+            self.controller[key].extend(column_dates, values)
 
     def get(self, date, include_date=True, include_id=True):
         event = self.controller.get(date)
@@ -68,6 +181,38 @@ class Space(Representable):
     def all(self, times=None):
         return self.controller.all(times)
 
+    def memory_usage(self, deep=True) -> pd.DataFrame:
+        # one row per stored stream, the space itself and calculated streams are accounted in their own row
+        rows, lengths = {}, {}
+        overhead = shallow_size(self) + shallow_size(self.controller) + container_size(self.controller.streams)
+
+        for name, stream in self.controller.streams.items():
+            if isinstance(stream, Stream):
+                rows[name] = stream.memory_usage(deep)
+                lengths[name] = 0 if stream.empty else len(stream)
+            else:
+                overhead += shallow_size(stream)
+
+        rows[SPACE_ROW] = pd.Series(dict.fromkeys(MEMORY_COMPONENTS, 0), dtype=np.int64)
+        rows[SPACE_ROW]["objects"] = overhead
+        if self.index is not None:
+            rows[SPACE_ROW]["index"] = self.index.memory_usage(deep)
+        lengths[SPACE_ROW] = 0
+
+        usage = pd.DataFrame(rows).T.astype(np.int64)
+        usage["total"] = usage.sum(axis=1)
+        usage["length"] = pd.Series(lengths)
+        return usage
+
+    def compact(self, older_than, freq="1d", how="last") -> int:
+        removed = 0
+        for name, stream in self.controller.streams.items():
+            if isinstance(stream, Stream):
+                method = how.get(name, "last") if isinstance(how, dict) else how
+                removed += stream.compact(older_than, freq=freq, how=method)
+
+        return removed
+
     def add_stream(self, name):
         self.controller.ensure_stream(name)
 
@@ -103,9 +248,8 @@ class Space(Representable):
     def __getitem__(self, item):
         from stateful.storage.calculated_stream import CalculatedStream
 
-        if (isinstance(item, str) and ("/" in item or "-" in item)) or isinstance(item, datetime):
-            date = pd.to_datetime(item, utc=True)
-            return self.get(date, include_date=False, include_id=False)
+        if (isinstance(item, str) and ("/" in item or "-" in item)) or isinstance(item, (datetime, int, np.integer)):
+            return self.get(item, include_date=False, include_id=False)
         if list_of_instance(item, datetime):
             return list(self.all(item))
         elif isinstance(item, str):
@@ -1,28 +1,55 @@
-from datetime import datetime
-from itertools import repeat
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
 from random import choice
+from tempfile import TemporaryDirectory
 from typing import Dict
 
+import numpy as np
 import pandas as pd
 from pandas import DatetimeIndex
+from pandas.api.types import infer_dtype
+from stateful.batcher import MicroBatcher
 from stateful.state_transposed import TransposedState
 from stateful.representable import Representable
-from stateful.space import Space
+from stateful.event.event_column import EventColumn
+from stateful.space import Space, SPACE_ROW
+from stateful.storage.arrays import coerce, to_scalar, SCHEMA_DTYPES
+from stateful.storage.base import MEMORY_COMPONENTS
 from stateful.storage.calculated_stream import CalculatedStream
+from stateful.storage.dictionary import Dictionary
+from stateful.storage.pool import TimestampPool
+from stateful.storage.log import WriteAheadLog, write_manifest, recover_state
+from stateful.storage.store import save_state, open_state, merge_state
+from stateful.storage.stream import string_dtype
 from stateful.storage.stream_graph import StreamGraph
-from stateful.utils import list_of_instance
+from stateful.utils import list_of_instance, shallow_size, container_size
 
 
 class State(Representable):
-    def __init__(self, primary_key, time_key="date", configuration=None, stream_name=None):
+    def __init__(self, primary_key, time_key="date", configuration=None, stream_name=None, pool_timestamps=False,
+                 reorder_window=None, strict=False, idempotent=False):
         Representable.__init__(self)
         self.primary_key = primary_key
         self.time_key = time_key
+        self.reorder_window = pd.Timedelta(reorder_window).value if reorder_window is not None else None
 
         self.all_spaces = {}
+        self.dictionaries = {}
+        self.timestamps = TimestampPool() if pool_timestamps else None
+        self.log = None
+        self.batcher = None
         self.configuration = configuration if configuration else {}
+        self.strict = strict
+        self.idempotent = idempotent
         self.graph = StreamGraph(stream_name if stream_name else {key for key in self.configuration.keys()})
 
+        if strict:
+            # the configuration is the schema, every stream declares its dtype and nothing is inferred
+            undeclared = [name for name, conf in self.configuration.items() if conf.get("dtype") not in SCHEMA_DTYPES]
+            assert not undeclared, f"a strict state needs a dtype out of {SCHEMA_DTYPES} for {undeclared}"
+
     @property
     def start(self):
         return min([state.start for state in self.all_spaces.values()])
@@ -67,7 +94,12 @@ class State(Representable):
                                          primary_value=key,
                                          time_key=self.time_key,
                                          graph=self.graph,
-                                         configuration=self.configuration)
+                                         configuration=self.configuration,
+                                         dictionaries=self.dictionaries,
+                                         pool=self.timestamps,
+                                         window=self.reorder_window,
+                                         idempotent=self.idempotent)
+            self.all_spaces[key].log = self.log
 
     def add(self, event: dict):
         assert isinstance(event, dict), "Event has to be a dictionary"
@@ -75,17 +107,131 @@ class State(Representable):
         assert self.time_key in event, "Event has to include time key"
         key = event.pop(self.primary_key)
 
-        for name in event.keys():
-            if name != self.time_key:
-                self.graph.add(name, [])
+        names = [name for name in event.keys() if name != self.time_key]
+        self._declared(names)
+        if self.strict:
+            # one event is validated as a column of one row, so that add and include accept the same values
+            for name in names:
+                event[name] = to_scalar(coerce([event[name]], self.configuration[name]["dtype"])[0])
+        for name in names:
+            self.graph.add(name, [])
 
         self._ensure(key)
         self.all_spaces[key].add(event)
 
+    def _declared(self, names):
+        if self.strict:
+            unknown = [name for name in names if name not in self.configuration]
+            assert not unknown, f"{unknown} are not declared in the configuration of a strict state"
+
+    def add_many(self, events):
+        # consecutive events with the same keys are loaded together, a key left out of an event is not touched
+        start = 0
+        for stop in range(1, len(events) + 1):
+            if stop == len(events) or events[stop].keys() != events[start].keys():
+                run = events[start:stop]
+                columns = [name for name in run[0].keys() if name not in (self.primary_key, self.time_key)]
+                df = pd.DataFrame({name: pd.Series([event[name] for event in run], dtype=object)
+                                   for name in run[0].keys()})
+                self.include(df, columns=columns)
+                start = stop
+
+    async def aadd(self, event: dict):
+        await self._batcher().put(event)
+
+    async def aadd_many(self, events):
+        batcher = self._batcher()
+        for event in events:
+            await batcher.put(event)
+
+    async def aflush(self):
+        await self._batcher().join()
+        self.flush()
+
+    def batching(self, batch_size=4096, latency=0.005, max_pending=65536):
+        self.batcher = MicroBatcher(self, batch_size=batch_size, latency=latency, max_pending=max_pending)
+        return self
+
+    def _batcher(self):
+        if self.batcher is None:
+            self.batching()
+        return self.batcher
+
+    def save(self, path):
+        save_state(self, path)
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        return open_state(path, mmap=mmap)
+
+    def durable(self, path, group=256, sync_every=4096, sync_interval=1.0, checkpoint_every=None):
+        write_manifest(path, self)
+        self.log = WriteAheadLog(path,
+                                 state=self,
+                                 group=group,
+                                 sync_every=sync_every,
+                                 sync_interval=sync_interval,
+                                 checkpoint_every=checkpoint_every)
+        for space in self.all_spaces.values():
+            space.log = self.log
+
+        if self.all_spaces and not self.log.checkpointed:
+            self.log.checkpoint()
+
+        return self
+
+    @classmethod
+    def recover(cls, path, mmap=True, **options):
+        return recover_state(path, mmap=mmap).durable(path, **options)
+
+    def checkpoint(self):
+        assert self.log is not None, "checkpoints need a durable state"
+        self.log.checkpoint()
+
+    def flush(self):
+        if self.log is not None:
+            self.log.flush()
+
+    def memory_usage(self, deep=True) -> pd.DataFrame:
+        # bytes per stream name and storage component summed over the spaces, dictionaries are shared by all of them
+        frames = [space.memory_usage(deep) for space in self.all_spaces.values()]
+        if not frames:
+            return pd.DataFrame()
+
+        spaces = pd.concat(frames)
+        grouped = spaces.groupby(level=0, sort=False)
+
+        usage = grouped.sum()[list(MEMORY_COMPONENTS)]
+        dictionaries = {name: dictionary.memory_usage(deep) for name, dictionary in self.dictionaries.items()}
+        usage["dictionary"] = pd.Series(dictionaries, dtype=np.int64).reindex(usage.index, fill_value=0)
+        usage.loc[SPACE_ROW, "objects"] += shallow_size(self) + container_size(self.all_spaces)
+        if self.timestamps is not None:
+            usage.loc[SPACE_ROW, "events"] += self.timestamps.memory_usage(deep)
+
+        usage["total"] = usage.sum(axis=1)
+        usage["length"] = grouped["length"].sum()
+        usage["streams"] = grouped.size()
+        usage["empty"] = (spaces["length"] == 0).groupby(level=0, sort=False).sum()
+        usage.loc[SPACE_ROW, "empty"] = sum(space.empty for space in self.all_spaces.values())
+        usage["bytes_per_event"] = usage["total"] / usage["length"].where(usage["length"] > 0)
+        return usage
+
+    def compact(self, older_than, freq="1d", how="last") -> int:
+        if isinstance(older_than, timedelta):
+            older_than = self.end - older_than
+
+        removed = sum(space.compact(older_than, freq=freq, how=how) for space in self.all_spaces.values())
+        if removed and self.log is not None:
+            # compaction is not logged, the replay has to start from the compacted state
+            self.log.checkpoint()
+
+        return removed
+
     def set(self, name, space):
         self.all_spaces[name] = space
 
-    def include(self, df, primary_column=None, time_column=None, event=None, columns=None, drop_na=False, fill_na=None):
+    def include(self, df, primary_column=None, time_column=None, event=None, columns=None, drop_na=False, fill_na=None,
+                workers=None):
         assert event is not None or columns is not None
         assert event is None or isinstance(event, dict)
         assert columns is None or isinstance(columns, (dict, list))
@@ -103,30 +249,137 @@ class State(Representable):
         elif isinstance(columns, list):
             columns = {column: column for column in columns}
 
-        if columns:
-            extra_vals = df.rename(columns=columns)[list(columns.values())].to_dict(orient="records")
-        else:
-            extra_vals = repeat({})
-
-        for (id, time), extra in zip(df[[primary_column, time_column]].values, extra_vals):
-            if pd.isna(time):
-                if drop_na:
-                    continue
-                else:
-                    time = fill_na
-
-            row = {self.primary_key: id, self.time_key: time}
-
-            row.update(extra)
-            if event:
-                row.update(event)
-
-            self.add(row)
+        # an idempotent state loads in this process, the index of a space has to see every event of that space
+        if workers is not None and workers > 1 and not self.idempotent:
+            self._declared(list(columns.values()) + list((event or {}).keys()))
+            if self.strict:
+                # the frame is validated before it is split, a bad column fails before any partition is merged
+                df = df.assign(**{column: coerce(df[column].to_numpy(), self.configuration[name]["dtype"])
+                                  for column, name in columns.items()})
+                for name, value in (event or {}).items():
+                    coerce([value], self.configuration[name]["dtype"])
+            options = dict(primary_column=primary_column, time_column=time_column, event=event, columns=columns,
+                           drop_na=drop_na, fill_na=fill_na)
+            return self._include_parallel(df, workers, options)
+
+        times = df[time_column]
+        if drop_na:
+            df, times = df[times.notna()], times[times.notna()]
+        elif fill_na is not None:
+            times = times.fillna(fill_na)
+        assert times.notna().all(), "rows without a time need drop_na or fill_na"
+
+        # one stable sort by key, every space then loads whole column slices in the order of the frame
+        codes, keys = pd.factorize(df[primary_column], use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+
+        dates = pd.DatetimeIndex(pd.to_datetime(times, utc=True)).asi8[order]
+        values = {name: df[column].to_numpy()[order] for column, name in columns.items()}
+        for name, value in (event or {}).items():
+            values[name] = np.empty(len(df), dtype=object)
+            values[name].fill(value)
+
+        self._declared(values.keys())
+        if self.strict:
+            values = {name: coerce(column, self.configuration[name]["dtype"]) for name, column in values.items()}
+
+        for name in values.keys():
+            self.graph.add(name, [])
+
+        for position, key in enumerate(keys.tolist()):
+            rows = slice(bounds[position], bounds[position + 1])
+            self._ensure(key)
+            self.all_spaces[key].extend(dates[rows], {name: column[rows] for name, column in values.items()})
+
+    def include_stream(self, chunks, callback=None, **options) -> int:
+        # chunks are loaded one at a time and dropped, memory is bounded by the chunk and not by the whole input
+        total, started = 0, time.perf_counter()
+        for number, chunk in enumerate(chunks):
+            chunk_started = time.perf_counter()
+            df = _chunk_frame(chunk)
+            self.include(df, **options)
+
+            total += len(df)
+            if callback is not None:
+                now = time.perf_counter()
+                callback({"chunk": number,
+                          "rows": len(df),
+                          "total": total,
+                          "seconds": now - chunk_started,
+                          "rows_per_second": total / max(now - started, 1e-9)})
+
+        return total
+
+    def read_csv(self, path, primary_column=None, time_column=None, columns=None, event=None, drop_na=False,
+                 fill_na=None, chunksize=65536, callback=None, **options) -> int:
+        # only the projected columns are parsed and the file is loaded one block at a time
+        projection = self._projection(primary_column, time_column, columns)
+        with pd.read_csv(path, usecols=projection, chunksize=chunksize, **options) as chunks:
+            return self.include_stream(chunks, callback=callback, primary_column=primary_column,
+                                       time_column=time_column, columns=columns, event=event, drop_na=drop_na,
+                                       fill_na=fill_na)
+
+    def read_parquet(self, path, primary_column=None, time_column=None, columns=None, event=None, drop_na=False,
+                     fill_na=None, chunksize=65536, callback=None) -> int:
+        import pyarrow.parquet as parquet
+
+        projection = self._projection(primary_column, time_column, columns)
+        batches = parquet.ParquetFile(path).iter_batches(batch_size=chunksize, columns=projection)
+        return self.include_stream(batches, callback=callback, primary_column=primary_column,
+                                   time_column=time_column, columns=columns, event=event, drop_na=drop_na,
+                                   fill_na=fill_na)
+
+    def _projection(self, primary_column, time_column, columns) -> list:
+        projection = [primary_column or self.primary_key, time_column or self.time_key]
+        projection += [column for column in (columns or []) if column not in projection]
+        return projection
+
+    def _include_parallel(self, df, workers, options):
+        # spaces are independent, each worker builds a partition of the keys and saves it in the segment format
+        codes, _ = pd.factorize(df[options["primary_column"]], use_na_sentinel=False)
+        partitions = codes % workers
+
+        # every worker starts without dictionaries, so string streams are made categories or not here once
+        configuration = dict(self.configuration)
+        columns = {name: df[column].to_numpy() for column, name in options["columns"].items()}
+        for name, value in (options["event"] or {}).items():
+            columns[name] = np.full(len(df), value, dtype=object)
+        for name, values in columns.items():
+            values = values[~pd.isna(values)]
+            if "dtype" in configuration.get(name, {}) or not len(values) or infer_dtype(values[:1]) != "string":
+                continue
+            dtype = string_dtype(self.dictionaries.setdefault(name, Dictionary()), values)
+            configuration[name] = dict(configuration.get(name, {}), dtype=dtype)
+
+        with TemporaryDirectory() as directory, ProcessPoolExecutor(max_workers=workers) as executor:
+            paths = [os.path.join(directory, str(partition)) for partition in range(workers)]
+            futures = [executor.submit(_include_partition,
+                                       self.primary_key,
+                                       self.time_key,
+                                       configuration,
+                                       self.strict,
+                                       df[partitions == partition],
+                                       path,
+                                       options) for partition, path in enumerate(paths)]
+            for future, path in zip(futures, paths):
+                future.result()
+                merge_state(self, path, mmap=False)
+
+        if self.log is not None:
+            # merged spaces are not in the log, the replay has to start from a snapshot that holds them
+            self.log.checkpoint()
 
     def all(self, dates):
+        if dates is not None and len(dates) and not isinstance(dates, DatetimeIndex):
+            # one grid object for every space, so that it is converted and resolved against the pool once
+            dates = DatetimeIndex(pd.to_datetime(dates, utc=True))
+
         for name, space in self.all_spaces.items():
             events = space.all(dates)
-            events.add_column(self.primary_key, name)
+            keys = np.empty(len(events.dates), dtype=object)
+            keys.fill(name)
+            events.add_column(EventColumn(self.primary_key, events.dates, keys))
             yield events
 
     def __getitem__(self, item):
@@ -141,7 +394,9 @@ class State(Representable):
             print(item.start, item.stop, item.step)
 
     def filter(self, function):
-        state = State(self.primary_key, self.time_key, self.configuration)
+        state = State(self.primary_key, self.time_key, self.configuration, reorder_window=self.reorder_window,
+                      strict=self.strict, idempotent=self.idempotent)
+        state.timestamps = self.timestamps
         for name, space in self.all_spaces.items():
             if function(space):
                 state.set(name, space)
@@ -186,3 +441,21 @@ class State(Representable):
 
     def infer(self, freq="1d"):
         pass
+
+
+def _include_partition(primary_key, time_key, configuration, strict, df, path, options):
+    state = State(primary_key, time_key, configuration=configuration, strict=strict)
+    state.include(df, **options)
+    save_state(state, path)
+
+
+def _chunk_frame(chunk):
+    if isinstance(chunk, pd.DataFrame):
+        return chunk
+    elif isinstance(chunk, (dict, list)):
+        # a dictionary of columns or a list of records
+        return pd.DataFrame(chunk)
+    elif hasattr(chunk, "to_pandas"):
+        return chunk.to_pandas()
+
+    return chunk.df()
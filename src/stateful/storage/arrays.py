@@ -0,0 +1,389 @@
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+@lru_cache(maxsize=None)
+def empty_array(dtype) -> np.ndarray:
+    # every empty column shares one read only array per dtype until its first extend
+    array = np.empty(0, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+class GrowableArray:
+    # appends are amortized O(1), so are discards from the front, the head moves until half the buffer is dead
+    __slots__ = ("dtype", "_data", "_head", "_size")
+
+    def __init__(self, dtype, data=None):
+        self.dtype = np.dtype(dtype)
+        self._data = empty_array(self.dtype) if data is None else np.asarray(data, dtype=self.dtype)
+        self._head = 0
+        self._size = len(self._data)
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._data[self._head:self._size]
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def memory_usage(self, deep=False) -> int:
+        return self.nbytes + (object_size(self.data) if deep else 0)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        size = self._size + len(values)
+
+        if size > len(self._data):
+            length = len(self) + len(values)
+            data = np.empty(max(2 * len(self), length, 8), dtype=self.dtype)
+            data[:len(self)] = self.data
+            self._data, self._head, self._size, size = data, 0, len(self), length
+
+        self._data[self._size:size] = values
+        self._size = size
+
+    def truncate(self, size):
+        self._size = min(self._head + size, self._size)
+
+    def discard(self, count):
+        self._head = min(self._head + count, self._size)
+        if self._head > len(self._data) // 2:
+            self.shrink()
+
+    def shrink(self):
+        if len(self._data) != len(self):
+            self._data = self.data.copy()
+            self._head, self._size = 0, len(self._data)
+
+    def __getitem__(self, item):
+        return self.data[item]
+
+    def __setitem__(self, item, value):
+        self.data[item] = value
+
+    def __len__(self):
+        return self._size - self._head
+
+
+class CodedArray:
+    # an object column read from disk as codes into a vocabulary, values are decoded when they are read and
+    # the column becomes a plain growable array on its first write
+    __slots__ = ("codes", "vocabulary", "_values")
+    dtype = np.dtype(object)
+
+    def __init__(self, codes: GrowableArray, vocabulary: np.ndarray):
+        self.codes = codes
+        # the missing slot at the end is where the code -1 points
+        self.vocabulary = np.append(vocabulary, np.NaN) if len(vocabulary) else np.array([np.NaN], dtype=object)
+        self._values = None
+
+    @property
+    def values(self) -> GrowableArray:
+        if self._values is None:
+            self._values = GrowableArray(object, self.data)
+            self.codes, self.vocabulary = None, None
+        return self._values
+
+    @property
+    def data(self) -> np.ndarray:
+        if self._values is not None:
+            return self._values.data
+        return self.vocabulary[self.codes.data]
+
+    @property
+    def nbytes(self):
+        if self._values is not None:
+            return self._values.nbytes
+        return self.codes.nbytes + self.vocabulary.nbytes
+
+    def memory_usage(self, deep=False) -> int:
+        if self._values is not None:
+            return self._values.memory_usage(deep)
+        return self.nbytes + (object_size(self.vocabulary) if deep else 0)
+
+    def extend(self, values):
+        self.values.extend(values)
+
+    def truncate(self, size):
+        (self.codes if self._values is None else self._values).truncate(size)
+
+    def discard(self, count):
+        (self.codes if self._values is None else self._values).discard(count)
+
+    def shrink(self):
+        (self.codes if self._values is None else self._values).shrink()
+
+    def __getitem__(self, item):
+        if self._values is not None:
+            return self._values[item]
+        return self.vocabulary[self.codes[item]]
+
+    def __setitem__(self, item, value):
+        self.values[item] = value
+
+    def __len__(self):
+        return len(self.codes) if self._values is None else len(self._values)
+
+
+STORAGE_DTYPES = {"integer": np.int64, "floating": np.float64, "boolean": np.bool_, "category": np.int32}
+SCHEMA_DTYPES = ("integer", "floating", "boolean", "category", "string")
+
+
+def storage_dtype(dtype) -> np.dtype:
+    return np.dtype(STORAGE_DTYPES.get(dtype, object))
+
+
+def coerce(values, dtype) -> np.ndarray:
+    # validates a whole column against a declared dtype, numeric columns come back typed where missing values allow
+    if not isinstance(values, np.ndarray):
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        values = array
+
+    valid = ~pd.isna(values)
+    present = values[valid]
+    if dtype in ("string", "category"):
+        kind = pd.api.types.infer_dtype(present, skipna=False)
+        assert kind in ("string", "empty"), f"a {dtype} column got {kind} values"
+        return values
+
+    storage = STORAGE_DTYPES[dtype]
+    try:
+        typed = present.astype(storage)
+    except (TypeError, ValueError):
+        typed = None
+    assert typed is not None and (typed == present).all(), f"a {dtype} column got values that are not {dtype}"
+
+    if valid.all():
+        return typed
+
+    result = np.full(len(values), np.NaN, dtype=np.float64 if dtype == "floating" else object)
+    result[valid] = typed
+    return result
+
+
+def split_missing(values, dtype):
+    # typed storage keeps a zero where a value is missing, the validity mask tells the two apart
+    if not isinstance(values, np.ndarray):
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        values = array
+
+    valid = ~pd.isna(values)
+    storage = storage_dtype(dtype)
+
+    if storage == object:
+        result = np.empty(len(values), dtype=object)
+        result[:] = values
+    else:
+        result = np.zeros(len(values), dtype=storage)
+        result[valid] = values[valid].astype(storage)
+
+    return result, valid
+
+
+def object_size(values: np.ndarray) -> int:
+    # the python objects an object array points to, typed arrays hold their values inline
+    if values.dtype != object:
+        return 0
+
+    return sum(sys.getsizeof(value) for value in values)
+
+
+def with_missing(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    if valid.all():
+        return values
+
+    values = values.astype(np.float64) if values.dtype.kind in "iub" else values.copy()
+    values[~valid] = np.NaN
+    return values
+
+
+def to_scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_nanosecond(date) -> int:
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    elif isinstance(date, pd.Timestamp):
+        return date.value
+    elif isinstance(date, datetime):
+        delta = date - (EPOCH if date.tzinfo is None else EPOCH_UTC)
+        return (delta.days * 86400 + delta.seconds) * 1000000000 + delta.microseconds * 1000
+    elif isinstance(date, np.datetime64):
+        return int(date.astype("datetime64[ns]").astype(np.int64))
+    else:
+        return pd.to_datetime(date, utc=True).value
+
+
+def to_nanoseconds(dates) -> np.ndarray:
+    if isinstance(dates, pd.DatetimeIndex):
+        return dates.asi8
+
+    array = np.asarray(dates)
+    if array.dtype.kind in "iu":
+        return array.astype(np.int64, copy=False)
+
+    return pd.DatetimeIndex(pd.to_datetime(array, utc=True)).asi8
+
+
+def to_timestamp(date: int) -> pd.Timestamp:
+    return pd.Timestamp(date, tz="UTC")
+
+
+def to_timestamps(index: np.ndarray) -> pd.DatetimeIndex:
+    return pd.to_datetime(index, utc=True)
+
+
+def floor_positions(index: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    return np.searchsorted(index, dates, side="right") - 1
+
+
+def floor_values(index: np.ndarray, values: np.ndarray, dates: np.ndarray, default, dtype=None,
+                 valid=None) -> np.ndarray:
+    return take_floor(floor_positions(index, dates), values, default, dtype=dtype, valid=valid)
+
+
+def take_floor(positions: np.ndarray, values: np.ndarray, default, dtype=None, valid=None) -> np.ndarray:
+    clipped = np.maximum(positions, 0)
+
+    result = np.empty(len(positions), dtype=dtype if dtype else values.dtype)
+    result[:] = values[clipped]
+    result[positions < 0] = default
+
+    if valid is not None:
+        result = with_missing(result, valid[clipped] | (positions < 0))
+    return result
+
+
+def interpolate(index: np.ndarray, values: np.ndarray, dates: np.ndarray, valid=None) -> np.ndarray:
+    left = np.clip(floor_positions(index, dates), 0, len(index) - 1)
+    right = np.minimum(left + 1, len(index) - 1)
+
+    span = index[right] - index[left]
+    weight = np.divide(dates - index[left], span, out=np.zeros(len(dates)), where=span > 0)
+
+    result = values[left] + (values[right] - values[left]) * weight
+    if valid is not None:
+        result = with_missing(result, valid[left] & valid[right])
+    return result
+
+
+def ceil_positions(index: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    return np.searchsorted(index, dates, side="left")
+
+
+def change_mask(values: np.ndarray, previous=None, has_previous=False, valid=None, previous_valid=True) -> np.ndarray:
+    if valid is not None:
+        return change_mask(values, previous, has_previous) | change_mask(valid, previous_valid, has_previous)
+
+    if has_previous:
+        values = np.concatenate([np.array([previous], dtype=values.dtype), values])
+
+    mask = np.ones(len(values), dtype=bool)
+    if len(values) > 1:
+        missing = pd.isna(values)
+        equal = (values[1:] == values[:-1]) | (missing[1:] & missing[:-1])
+        mask[1:] = ~equal
+
+    return mask[1:] if has_previous else mask
+
+
+def same_value(left, right) -> bool:
+    return left == right or (pd.isna(left) and pd.isna(right))
+
+
+def increment_duplicates(index: np.ndarray, step) -> np.ndarray:
+    # index has to be sorted, every key ends up at least one step after the key in front of it
+    shift = np.arange(len(index), dtype=np.int64) * step
+    return np.maximum.accumulate(index - shift) + shift
+
+
+def increment_after(stored: np.ndarray, index: np.ndarray, step) -> np.ndarray:
+    # moves sorted new keys past the runs of stored keys they collide with, stored keys stay in place
+    index = increment_duplicates(index, step)
+    if not len(stored) or not len(index):
+        return index
+
+    run_ends = np.flatnonzero(np.append(np.diff(stored) != step, True))
+    run_last = run_ends[np.searchsorted(run_ends, np.arange(len(stored)))]
+
+    while True:
+        positions = np.minimum(np.searchsorted(stored, index), len(stored) - 1)
+        hits = stored[positions] == index
+        if not hits.any():
+            return index
+
+        index[hits] = stored[run_last[positions[hits]]] + step
+        index = increment_duplicates(index, step)
+
+
+def resolve_duplicates(index: np.ndarray, values: np.ndarray, valid: np.ndarray, policy, step):
+    # index has to be sorted with duplicates kept in arrival order
+    if policy == "increment":
+        return increment_duplicates(index, step), values, valid
+
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"{policy} is not a known duplicate policy, use one of {DUPLICATE_POLICIES}")
+
+    if len(index) < 2:
+        return index, values, valid
+
+    starts = np.flatnonzero(np.concatenate([[True], index[1:] != index[:-1]]))
+    if len(starts) == len(index):
+        return index, values, valid
+
+    if policy == "first":
+        return index[starts], values[starts], valid[starts]
+    elif policy == "last":
+        ends = np.append(starts[1:], len(index)) - 1
+        return index[starts], values[ends], valid[ends]
+    else:
+        return index[starts], np.add.reduceat(values, starts), np.logical_and.reduceat(valid, starts)
+
+
+DUPLICATE_POLICIES = ("increment", "first", "last", "sum", "count")
+COMPACTIONS = ("last", "mean", "max")
+
+
+def downsample(index: np.ndarray, values: np.ndarray, valid: np.ndarray, step, how):
+    # one point per bucket, labeled by its last event so that a floor read never sees a value before it happened,
+    # missing values are skipped
+    if how not in COMPACTIONS:
+        raise ValueError(f"{how} is not a known compaction, use one of {COMPACTIONS}")
+
+    if not len(index):
+        return index, values, valid
+
+    buckets = index // step * step
+    starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+
+    ends = np.append(starts[1:], len(index)) - 1
+    if how == "last":
+        return index[ends], values[ends], valid[ends]
+
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    if how == "mean":
+        values = np.add.reduceat(np.where(valid, values, 0).astype(np.float64), starts) / np.maximum(counts, 1)
+    else:
+        if values.dtype == np.bool_:
+            lowest = False
+        elif np.issubdtype(values.dtype, np.integer):
+            lowest = np.iinfo(values.dtype).min
+        else:
+            lowest = -np.inf
+        values = np.maximum.reduceat(np.where(valid, values, lowest), starts)
+
+    valid = counts > 0
+    return index[ends], np.where(valid, values, 0).astype(values.dtype), valid
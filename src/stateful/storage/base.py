@@ -0,0 +1,269 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from pandas import DatetimeIndex
+from pandas.api.types import infer_dtype
+from stateful.storage.arrays import to_nanosecond, to_nanoseconds, to_timestamp, resolve_duplicates, increment_after, \
+    split_missing, take_floor, downsample, DUPLICATE_POLICIES, STORAGE_DTYPES
+from stateful.storage.dictionary import Dictionary
+from stateful.utils import is_missing
+
+
+STORAGE_MODES = ("events", "changes")
+MEMORY_COMPONENTS = ("events", "changes", "missing", "buffer", "cache", "index", "objects")
+
+
+class TreeBase:
+    __slots__ = ("name", "dtype", "on_dublicate", "interpolation", "storage", "dictionary", "retention", "max_events",
+                 "baseline")
+    increment = pd.Timedelta(1, unit="ns").value
+    pooled = False
+
+    def __init__(self, name, dtype, interpolation="floor", on_dublicate="increment", dictionary=None, storage="events",
+                 retention=None, max_events=None, baseline=False):
+        assert on_dublicate in DUPLICATE_POLICIES, f"on_dublicate has to be one of {DUPLICATE_POLICIES}"
+        assert storage in STORAGE_MODES, f"storage has to be one of {STORAGE_MODES}"
+        assert storage == "events" or interpolation == "floor", "only floor interpolated streams can drop events"
+        assert max_events is None or max_events > 0, "max_events has to be positive"
+        assert storage == "events" or (retention is None and max_events is None), \
+            "retention is only supported for streams that keep their events"
+        self.name = name
+        self.dtype = "integer" if on_dublicate == "count" else dtype
+        self.on_dublicate = on_dublicate
+        self.interpolation = interpolation
+        self.storage = storage
+
+        self.retention = pd.Timedelta(retention).value if retention is not None else None
+        self.max_events = max_events
+        self.baseline = baseline
+
+        if self.dtype == "category" and dictionary is None:
+            dictionary = Dictionary()
+        self.dictionary = dictionary
+
+    @property
+    def empty(self):
+        return self.length == 0
+
+    @property
+    def typed(self):
+        return self.dtype in STORAGE_DTYPES
+
+    @property
+    def default(self):
+        if self.dtype in {"integer", "floating"}:
+            return 0
+        elif self.dtype == "boolean":
+            return False
+        else:
+            return np.NaN
+
+    @property
+    def start(self):
+        raise NotImplementedError("start should be implemented by all children")
+
+    @property
+    def end(self):
+        raise NotImplementedError("end should be implemented by all children")
+
+    @property
+    def first(self):
+        if self.empty:
+            return self.default
+
+        return self.get(self.start)
+
+    @property
+    def last(self):
+        if self.empty:
+            return self.default
+
+        return self.get(self.end)
+
+    @staticmethod
+    def arguments(configuration):
+        return {key: value for key, value in configuration.items() if key != "backend"}
+
+    @classmethod
+    def from_example(cls, name, configuration, date, example, **options):
+        if "dtype" not in configuration:
+            configuration["dtype"] = infer_dtype([example])
+        return cls(name,
+                   index=[to_nanosecond(date)],
+                   values=[example],
+                   **options,
+                   **cls.arguments(configuration))
+
+    @classmethod
+    def from_arrays(cls, index, values, name=None, dtype=None, **configuration):
+        if dtype is None:
+            values = np.asarray(values, dtype=object)
+            valid = values[~pd.isna(values)]
+            dtype = infer_dtype(valid[:1]) if len(valid) else None
+
+        tree = cls(name, dtype, **configuration)
+        tree.extend(index, values)
+        return tree
+
+    def extend(self, index, values):
+        raise NotImplementedError("extend() should be implemented by all children")
+
+    def _sorted(self, index, values, valid):
+        index = to_nanoseconds(index)
+        order = np.argsort(index, kind="stable")
+        return index[order], values[order], valid[order]
+
+    def _resolved(self, index, values, valid):
+        return resolve_duplicates(index, values, valid, self.on_dublicate, self.increment)
+
+    def _merged(self, stored, index, values, valid):
+        # stored events are already resolved, the new ones have to be sorted
+        stored_index, stored_values, stored_valid = stored
+        if self.on_dublicate == "increment":
+            index = increment_after(stored_index, index, self.increment)
+
+        index = np.concatenate([stored_index, index])
+        values = np.concatenate([stored_values, values])
+        valid = np.concatenate([stored_valid, valid])
+
+        order = np.argsort(index, kind="stable")
+        return self._resolved(index[order], values[order], valid[order])
+
+    @property
+    def retained(self):
+        return self.retention is not None or self.max_events is not None
+
+    def retention_arguments(self):
+        return {"retention": self.retention, "max_events": self.max_events, "baseline": self.baseline}
+
+    def _expired(self, index) -> int:
+        # the number of leading events that fall out of the retention window, with a baseline the event in effect
+        # at the cutoff is kept so that floor reads after it stay correct
+        drop = 0
+        if self.max_events is not None:
+            drop = max(len(index) - self.max_events, 0)
+        if self.retention is not None and len(index):
+            cutoff = index[-1] - self.retention
+            if self.baseline:
+                drop = max(drop, np.searchsorted(index, cutoff, side="right") - 1)
+            else:
+                drop = max(drop, np.searchsorted(index, cutoff, side="left"))
+
+        return int(drop)
+
+    def compact(self, older_than, freq="1d", how="last") -> int:
+        assert self.storage == "events", "only streams that keep their events can be compacted"
+        assert how != "mean" or self.dtype == "floating", "only floating streams can be averaged"
+        assert how != "max" or self.dtype in {"integer", "floating", "boolean"}, "only numeric streams have a maximum"
+        if self.empty:
+            return 0
+
+        if isinstance(older_than, timedelta):
+            older_than = self.end - older_than
+
+        index, values, valid = self.arrays()
+        old = int(np.searchsorted(index, to_nanosecond(older_than), side="left"))
+        compacted = downsample(index[:old], values[:old], valid[:old], pd.Timedelta(freq).value, how)
+        if len(compacted[0]) == old:
+            return 0
+
+        # the last point is labeled by the last event before the cutoff and keeps its raw value, so that reads from
+        # the cutoff on see the value that was in effect there
+        compacted[1][-1], compacted[2][-1] = values[old - 1], valid[old - 1]
+        stored = index, values, valid
+        self._rebuild(*[np.concatenate([head, column[old:]]) for head, column in zip(compacted, stored)])
+        return old - len(compacted[0])
+
+    def _rebuild(self, index, values, valid):
+        raise NotImplementedError("_rebuild() should be implemented by all children")
+
+    def alias(self, name):
+        raise NotImplementedError("alias() should be implemented by all children")
+
+    def values(self):
+        raise NotImplementedError("values() should be implemented by all children")
+
+    def dates(self):
+        raise NotImplementedError("dates() should be implemented by all children")
+
+    def arrays(self):
+        raise NotImplementedError("arrays() should be implemented by all children")
+
+    def change_arrays(self):
+        raise NotImplementedError("change_arrays() should be implemented by all children")
+
+    def memory_usage(self, deep=True) -> dict:
+        raise NotImplementedError("memory_usage() should be implemented by all children")
+
+    def get(self, date):
+        raise NotImplementedError("get() should be implemented by all children")
+
+    def all(self, dates: DatetimeIndex):
+        raise NotImplementedError("all() should be implemented by all children")
+
+    def add(self, date, value):
+        raise NotImplementedError("add() should be implemented by all children")
+
+    def cast_input(self, value):
+        if self.on_dublicate == "count":
+            return 1, True
+        elif is_missing(value):
+            return (0 if self.typed else value), False
+
+        if self.dtype == "category":
+            return self.dictionary.encode(value), True
+        elif self.dtype == "integer":
+            return int(value), True
+        elif self.dtype == "floating":
+            return float(value), True
+        elif self.dtype == "boolean":
+            return bool(value), True
+        else:
+            return value, True
+
+    def cast_inputs(self, values):
+        if self.on_dublicate == "count":
+            return np.ones(len(values), dtype=np.int64), np.ones(len(values), dtype=bool)
+        elif self.dtype == "category":
+            values, valid = split_missing(values, None)
+            codes = np.zeros(len(values), dtype=np.int32)
+            codes[valid] = self.dictionary.encode_many(values[valid])
+            return codes, valid
+
+        return split_missing(values, self.dtype)
+
+    def output(self, value):
+        if self.dtype == "category":
+            return self.dictionary.decode(value)
+        elif self.dtype == "boolean":
+            return bool(value)
+        else:
+            return value
+
+    def _categorical(self, positions, codes, valid) -> pd.Categorical:
+        return self.dictionary.categorical(take_floor(positions, np.where(valid, codes, -1), -1))
+
+    def within(self, date) -> bool:
+        if self.empty:
+            return False
+
+        return self.start <= to_timestamp(to_nanosecond(date)) <= self.end
+
+    def floor(self, date):
+        raise NotImplementedError("floor() should be implemented by all children")
+
+    def ceil(self, date):
+        raise NotImplementedError("ceil() should be implemented by all children")
+
+    def on(self, on=True):
+        pass
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        raise NotImplementedError("__iter__() should be implemented by all children")
+
+    def __next__(self):
+        raise NotImplementedError("__next__() should be implemented by all children")
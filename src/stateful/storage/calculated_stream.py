@@ -4,7 +4,7 @@ from typing import Optional, Callable, List
 import numpy as np
 import pandas as pd
 from stateful.representable import Representable
-from stateful.utils import cast_output
+from stateful.utils import cast_output, infer_dtype
 from stateful.space import Space
 
 
@@ -131,11 +131,11 @@ class CalculatedStream(Representable):
         return event.apply(self.function, name=name, vectorized=self.vectorized)
 
     def _calculate_dtype(self, other):
-        dtypes = {self.dtype, other.dtype}
+        dtypes = {self.dtype, other.dtype if isinstance(other, CalculatedStream) else infer_dtype(other)}
 
         if "object" in dtypes:
             return "object"
-        if "string" in dtypes:
+        if "string" in dtypes or "category" in dtypes:
             return "string"
         if "floating" in dtypes:
             return "floating"
@@ -453,7 +453,8 @@ class CalculatedStream(Representable):
             return CalculatedStream(dependencies=self.dependencies,
                                     function=function,
                                     dtype=self._calculate_dtype(other),
-                                    parent=self._parent)
+                                    parent=self._parent,
+                                    vectorized=True)
 
     def __neq__(self, other):
         if isinstance(other, CalculatedStream):
@@ -470,7 +471,8 @@ class CalculatedStream(Representable):
             return CalculatedStream(dependencies=self.dependencies,
                                     function=function,
                                     dtype=self._calculate_dtype(other),
-                                    parent=self._parent)
+                                    parent=self._parent,
+                                    vectorized=True)
 
     def __gt__(self, other):
         if isinstance(other, CalculatedStream):
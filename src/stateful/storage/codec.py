@@ -0,0 +1,79 @@
+import datetime
+import json
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+TYPE = "__type__"
+
+
+def json_default(value):
+    # values json has no type for are written as an object with a type tag, anything else is refused
+    if value is pd.NaT or value is pd.NA:
+        return None
+    elif isinstance(value, np.datetime64):
+        return json_default(pd.Timestamp(value))
+    elif isinstance(value, np.timedelta64):
+        return json_default(pd.Timedelta(value))
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, pd.Timestamp):
+        return {TYPE: "timestamp", "value": value.value, "tz": str(value.tz) if value.tz is not None else None}
+    elif isinstance(value, datetime.datetime):
+        return {TYPE: "datetime", "value": value.isoformat()}
+    elif isinstance(value, datetime.date):
+        return {TYPE: "date", "value": value.isoformat()}
+    elif isinstance(value, pd.Timedelta):
+        return {TYPE: "timedelta", "value": value.value}
+    elif isinstance(value, datetime.timedelta):
+        return {TYPE: "pytimedelta", "value": [value.days, value.seconds, value.microseconds]}
+    elif isinstance(value, Decimal):
+        return {TYPE: "decimal", "value": str(value)}
+
+    raise TypeError(f"{type(value).__name__} values cannot be encoded")
+
+
+def json_object(value: dict):
+    kind = value.get(TYPE)
+    if kind is None:
+        return value
+    elif kind == "timestamp":
+        timestamp = pd.Timestamp(value["value"], tz="UTC")
+        return timestamp.tz_convert(value["tz"]) if value["tz"] is not None else timestamp.tz_localize(None)
+    elif kind == "datetime":
+        return datetime.datetime.fromisoformat(value["value"])
+    elif kind == "date":
+        return datetime.date.fromisoformat(value["value"])
+    elif kind == "timedelta":
+        return pd.Timedelta(value["value"])
+    elif kind == "pytimedelta":
+        return datetime.timedelta(*value["value"])
+    elif kind == "decimal":
+        return Decimal(value["value"])
+
+    raise ValueError(f"unknown type tag {kind}")
+
+
+def dumps(value) -> str:
+    return json.dumps(value, default=json_default)
+
+
+def loads(text):
+    return json.loads(text, object_hook=json_object)
+
+
+def encode_column(values: np.ndarray, valid: np.ndarray):
+    # an object column as int32 codes into a vocabulary of its distinct values, missing values get -1
+    codes = np.full(len(values), -1, dtype=np.int32)
+    present = values[valid]
+    if pd.api.types.infer_dtype(present, skipna=False) in ("string", "empty"):
+        codes[valid], vocabulary = pd.factorize(present)
+        return codes, list(vocabulary)
+
+    # other values are told apart by their encoding, so that 1, 1.0 and True stay three values
+    keys = np.empty(len(present), dtype=object)
+    keys[:] = [dumps(value) for value in present]
+    codes[valid], _ = pd.factorize(keys)
+    _, first = np.unique(codes[valid], return_index=True)
+    return codes, [present[position] for position in first]
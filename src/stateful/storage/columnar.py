@@ -0,0 +1,340 @@
+import numpy as np
+from pandas import DatetimeIndex
+from stateful.event.event_column import EventColumn
+from stateful.storage.arrays import GrowableArray, to_nanosecond, to_nanoseconds, to_timestamp, to_timestamps, \
+    floor_positions, take_floor, interpolate, ceil_positions, change_mask, to_scalar, storage_dtype, with_missing
+from stateful.storage.base import TreeBase
+from stateful.storage.pool import PooledArray
+from stateful.utils import shallow_size, container_size
+
+
+class ColumnarTree(TreeBase):
+    # events are buffered on add and merged into the sorted arrays the next time the tree is read
+    __slots__ = ("_iter", "_buffer", "_index", "_values", "_valid", "_change_index", "_change_values", "_change_valid",
+                 "_count", "_end", "pool")
+    buffer_size = 4096
+    pooled = True
+
+    def __init__(self,
+                 name,
+                 dtype,
+                 index=None,
+                 values=None,
+                 interpolation="floor",
+                 on_dublicate="increment",
+                 arrays=None,
+                 dictionary=None,
+                 storage="events",
+                 length=None,
+                 end=None,
+                 retention=None,
+                 max_events=None,
+                 baseline=False,
+                 pool=None):
+        TreeBase.__init__(self, name, dtype, interpolation=interpolation, on_dublicate=on_dublicate,
+                          dictionary=dictionary, storage=storage, retention=retention, max_events=max_events,
+                          baseline=baseline)
+
+        self._iter = None
+        self._buffer = []
+        self.pool = pool
+
+        if arrays is None:
+            self._change_index = self._index_array()
+            self._change_values = GrowableArray(storage_dtype(self.dtype))
+            self._change_valid = GrowableArray(bool)
+            self._events(self._index_array(), GrowableArray(storage_dtype(self.dtype)), GrowableArray(bool))
+        else:
+            self._index, self._values, self._valid, self._change_index, self._change_values, self._change_valid = arrays
+
+        self._count = len(self._index) if length is None else length
+        self._end = end if end is not None or not self._count else self._index[-1]
+
+        if index is not None and values is not None:
+            self.extend(index, values)
+
+    @property
+    def empty(self):
+        return not self._count and not self._buffer
+
+    @property
+    def length(self):
+        self._merge()
+        return self._count
+
+    @property
+    def start(self):
+        if self.empty:
+            return None
+
+        self._merge()
+        return to_timestamp(self._index[0])
+
+    @property
+    def end(self):
+        if self.empty:
+            return None
+
+        self._merge()
+        return to_timestamp(self._end)
+
+    def alias(self, name):
+        self._merge()
+        return ColumnarTree(name,
+                            dtype=self.dtype,
+                            interpolation=self.interpolation,
+                            on_dublicate=self.on_dublicate,
+                            arrays=self._arrays,
+                            dictionary=self.dictionary,
+                            storage=self.storage,
+                            length=self._count,
+                            end=self._end,
+                            pool=self.pool,
+                            **self.retention_arguments())
+
+    def _index_array(self, index=None):
+        # pooled trees keep int32 ids into the timestamps shared by the state
+        if self.pool is not None:
+            return PooledArray(self.pool, index)
+
+        return GrowableArray(np.int64, index)
+
+    def _events(self, index, values, valid):
+        if self.storage == "changes":
+            # repeated values are dropped on insert, the change points are all that is kept
+            self._index, self._values, self._valid = self._change_index, self._change_values, self._change_valid
+        else:
+            self._index, self._values, self._valid = index, values, valid
+
+    @property
+    def _arrays(self):
+        return self._index, self._values, self._valid, self._change_index, self._change_values, self._change_valid
+
+    def memory_usage(self, deep=True) -> dict:
+        events = 0 if self._index is self._change_index else self._index.nbytes + self._values.memory_usage(deep)
+        missing = self._change_valid.nbytes + (0 if self._valid is self._change_valid else self._valid.nbytes)
+
+        buffer = container_size(self._buffer)
+        if deep:
+            buffer += sum(container_size(item, deep) for item in self._buffer)
+
+        return {
+            "events": events,
+            "changes": self._change_index.nbytes + self._change_values.memory_usage(deep),
+            "missing": missing,
+            "buffer": buffer,
+            "cache": 0,
+            "objects": shallow_size(self) + sum(shallow_size(array) for array in self._arrays)
+        }
+
+    def values(self):
+        self._merge()
+        if self.dtype == "category":
+            return self.dictionary.categorical(np.where(self._valid.data, self._values.data, -1))
+
+        return with_missing(self._values.data, self._valid.data)
+
+    def arrays(self):
+        self._merge()
+        return self._index.data, self._values.data, self._valid.data
+
+    def change_arrays(self):
+        self._merge()
+        return self._change_index.data, self._change_values.data, self._change_valid.data
+
+    def dates(self):
+        self._merge()
+        return list(to_timestamps(self._index.data))
+
+    def get(self, date):
+        if self.empty:
+            return self.default
+
+        self._merge()
+        date = to_nanosecond(date)
+
+        if self._index[0] > date:
+            return self.default
+        elif self.interpolation == "linear":
+            if self._index[-1] < date:
+                return self.default
+            query = np.array([date], dtype=np.int64)
+            return to_scalar(interpolate(self._index.data, self._values.data, query, valid=self._valid.data)[0])
+        else:
+            position = _floor(self._change_index, date)
+            return self.output(to_scalar(self._change_values[position])) if self._change_valid[position] else np.NaN
+
+    def all(self, dates: DatetimeIndex):
+        if self.empty and self.dtype == "category":
+            return EventColumn(name=self.name, dates=dates, events=self.dictionary.categorical(np.full(len(dates), -1)),
+                               dtype=self.dtype)
+        elif self.empty:
+            values = np.empty(len(dates), dtype=storage_dtype(self.dtype))
+            values[:] = self.default
+            return EventColumn(name=self.name, dates=dates, events=values, dtype=self.dtype)
+
+        self._merge()
+
+        if self.interpolation == "linear" and self.dtype != "category":
+            query = to_nanoseconds(dates)
+            values = interpolate(self._index.data, self._values.data, query, valid=self._valid.data)
+            values[(query < self._index[0]) | (query > self._index[-1])] = self.default
+        elif self.dtype == "category":
+            values = self._categorical(self._floor_positions(dates), self._change_values.data, self._change_valid.data)
+        else:
+            values = take_floor(self._floor_positions(dates), self._change_values.data, self.default,
+                                valid=self._change_valid.data)
+
+        return EventColumn(name=self.name, dates=dates, events=values, dtype=self.dtype)
+
+    def _floor_positions(self, dates):
+        if self.pool is not None:
+            # the grid is resolved against the pool once and compared by rank in every pooled tree
+            return floor_positions(self._change_index.ranks(), self.pool.resolve(dates))
+
+        return floor_positions(self._change_index.data, to_nanoseconds(dates))
+
+    def add(self, date, value):
+        # the value is cast before it is buffered, a bad value fails here and never reaches the merge
+        value, valid = self.cast_input(value)
+        self._buffer.append((to_nanosecond(date), value, valid))
+        if len(self._buffer) >= self.buffer_size:
+            self._merge()
+
+    def extend(self, index, values):
+        self._merge()
+        self._insert(*self._sorted(index, *self.cast_inputs(values)))
+
+    def _merge(self):
+        if not self._buffer:
+            return
+
+        buffer, self._buffer = self._buffer, []
+        index = np.fromiter((date for date, _, _ in buffer), dtype=np.int64, count=len(buffer))
+        values = np.fromiter((value for _, value, _ in buffer), dtype=storage_dtype(self.dtype), count=len(buffer))
+        valid = np.fromiter((valid for _, _, valid in buffer), dtype=bool, count=len(buffer))
+
+        order = np.argsort(index, kind="stable")
+        self._insert(index[order], values[order], valid[order])
+
+    def _insert(self, index, values, valid):
+        if not len(index):
+            return
+
+        if len(self._index) and index[0] < self._index[-1]:
+            self._backfill(index, values, valid)
+        else:
+            self._append(index, values, valid)
+
+        if self.retained:
+            self._evict()
+
+    def _evict(self):
+        # the arrays only move their head forward, the buffers are compacted once half of them is dead
+        drop = self._expired(self._index.data)
+        if not drop:
+            return
+
+        first = self._index[drop]
+        changes = floor_positions(self._change_index.data, first)
+        self._change_index[changes] = first
+
+        for array in (self._index, self._values, self._valid):
+            array.discard(drop)
+        for array in (self._change_index, self._change_values, self._change_valid):
+            array.discard(changes)
+        self._count -= drop
+
+    def _append(self, index, values, valid):
+        popped = len(self._index) and index[0] == self._index[-1]
+        if popped:
+            index = np.concatenate([self._index[-1:], index])
+            values = np.concatenate([self._values[-1:], values])
+            valid = np.concatenate([self._valid[-1:], valid])
+            self._truncate(len(self._index) - 1)
+
+        index, values, valid = self._resolved(index, values, valid)
+        self._count += len(index) - popped
+        self._end = index[-1]
+
+        has_previous = len(self._index) > 0
+        previous, previous_valid = (self._values[-1], self._valid[-1]) if has_previous else (None, True)
+        changes = change_mask(values, previous=previous, has_previous=has_previous, valid=valid,
+                              previous_valid=previous_valid)
+
+        if self._index is not self._change_index:
+            self._index.extend(index)
+            self._values.extend(values)
+            self._valid.extend(valid)
+        self._change_index.extend(index[changes])
+        self._change_values.extend(values[changes])
+        self._change_valid.extend(valid[changes])
+
+    def _backfill(self, index, values, valid):
+        # only the events from the first late one on are merged again, the history in front of it is kept
+        start = int(np.searchsorted(self._index.data, index[0], side="left"))
+        stored = self._index[start:], self._values[start:], self._valid[start:]
+        merged = self._merged(stored, index, values, valid)
+
+        end = self._end
+        self._count -= len(self._index) - start
+        self._truncate(start)
+        self._append(*merged)
+        self._end = max(end, self._end)
+
+    def _truncate(self, size):
+        self._index.truncate(size)
+        self._values.truncate(size)
+        self._valid.truncate(size)
+
+        changes = np.searchsorted(self._change_index.data, self._index[-1], side="right") if size else 0
+        self._change_index.truncate(changes)
+        self._change_values.truncate(changes)
+        self._change_valid.truncate(changes)
+
+    def _rebuild(self, index, values, valid):
+        changes = change_mask(values, valid=valid)
+        self._count += len(index) - len(self._index)
+        self._end = max(self._end, index[-1])
+
+        self._change_index = self._index_array(index[changes])
+        self._change_values = GrowableArray(self._values.dtype, values[changes])
+        self._change_valid = GrowableArray(bool, valid[changes])
+        self._events(self._index_array(index),
+                     GrowableArray(self._values.dtype, values),
+                     GrowableArray(bool, valid))
+
+    def floor(self, date):
+        self._merge()
+        return self._item(_floor(self._index, to_nanosecond(date)))
+
+    def ceil(self, date):
+        self._merge()
+        return self._item(_ceil(self._index, to_nanosecond(date)))
+
+    def _item(self, position):
+        if not 0 <= position < len(self._index):
+            return np.NaN, self.default
+
+        value = self.output(to_scalar(self._values[position])) if self._valid[position] else np.NaN
+        return to_timestamp(self._index[position]), value
+
+    def __iter__(self):
+        self._iter = zip(self.dates(), self.values())
+        return self
+
+    def __next__(self):
+        return next(self._iter)
+
+
+def _floor(index, date: int) -> int:
+    # a pooled index is searched by rank, its dates are never looked up as a whole
+    if isinstance(index, PooledArray):
+        return index.floor(date)
+    return int(floor_positions(index.data, date))
+
+
+def _ceil(index, date: int) -> int:
+    if isinstance(index, PooledArray):
+        return index.ceil(date)
+    return int(ceil_positions(index.data, date))
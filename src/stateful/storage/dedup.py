@@ -0,0 +1,154 @@
+import struct
+from functools import lru_cache
+from hashlib import blake2b
+
+import numpy as np
+import pandas as pd
+from stateful.utils import container_size, is_missing
+
+MASK = (1 << 64) - 1
+MISSING = 0x9E3779B97F4A7C15
+FLOAT = 0xC2B2AE3D27D4EB4F
+INTEGRAL = float(1 << 63)
+
+
+def mix(value: int) -> int:
+    # the splitmix64 finalizer, mix_array computes the same on arrays
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & MASK
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EB & MASK
+    return value ^ (value >> 31)
+
+
+def mix_array(values: np.ndarray) -> np.ndarray:
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def text_hash(value) -> int:
+    text = value if isinstance(value, str) else f"{type(value).__name__}:{value}"
+    return int.from_bytes(blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+@lru_cache(maxsize=4096)
+def name_hash(name) -> int:
+    return text_hash(name)
+
+
+def value_hash(value) -> int:
+    # equal numbers hash alike whatever their type, so that 1, 1.0 and True are one value like in python
+    if is_missing(value):
+        return MISSING
+    elif isinstance(value, (bool, int, np.integer, np.bool_)):
+        return mix(int(value) & MASK)
+    elif isinstance(value, (float, np.floating)):
+        value = float(value)
+        if value.is_integer() and abs(value) < INTEGRAL:
+            return mix(int(value) & MASK)
+        return mix(struct.unpack("<Q", struct.pack("<d", value))[0] ^ FLOAT)
+
+    return text_hash(value)
+
+
+def value_hashes(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind in "iub":
+        return mix_array(values.astype(np.int64).view(np.uint64))
+    elif values.dtype.kind == "f":
+        values = values.astype(np.float64)
+        missing = np.isnan(values)
+        integral = ~missing & (values == np.floor(values)) & (np.abs(values) < INTEGRAL)
+
+        hashes = mix_array(values.view(np.uint64) ^ np.uint64(FLOAT))
+        hashes[integral] = mix_array(values[integral].astype(np.int64).view(np.uint64))
+        hashes[missing] = MISSING
+        return hashes
+
+    # other columns repeat their values, every distinct one is hashed once
+    codes, uniques = pd.factorize(values.astype(object) if values.dtype.kind == "M" else values)
+    table = np.fromiter(map(value_hash, uniques), dtype=np.uint64, count=len(uniques))
+    hashes = table[codes]
+    hashes[codes < 0] = MISSING
+    return hashes
+
+
+def event_hash(name, date: int, value) -> int:
+    return mix(mix(name_hash(name) ^ (date & MASK)) ^ value_hash(value))
+
+
+def event_hashes(name, dates: np.ndarray, values) -> np.ndarray:
+    if not isinstance(values, np.ndarray):
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        values = array
+
+    dates = np.asarray(dates, dtype=np.int64).view(np.uint64)
+    return mix_array(mix_array(np.uint64(name_hash(name)) ^ dates) ^ value_hashes(values))
+
+
+class HashIndex:
+    # the hashes of the events a space has seen, sorted in an array with the latest single adds in a set
+    __slots__ = ("_sorted", "_recent")
+    merge_size = 1024
+
+    def __init__(self, hashes=None):
+        self._sorted = np.unique(np.asarray(hashes, dtype=np.uint64)) if hashes is not None else \
+            np.empty(0, dtype=np.uint64)
+        self._recent = set()
+
+    def add(self, hash: int) -> bool:
+        if hash in self:
+            return False
+
+        self._recent.add(hash)
+        if len(self._recent) >= self.merge_size:
+            self._merge()
+        return True
+
+    def __contains__(self, hash: int) -> bool:
+        return hash in self._recent or bool(self._contains(np.uint64(hash)))
+
+    def add_many(self, hashes: np.ndarray) -> np.ndarray:
+        fresh = self.unseen(hashes)
+        self.update(hashes[fresh])
+        return fresh
+
+    def unseen(self, hashes: np.ndarray) -> np.ndarray:
+        # the mask of the hashes seen for the first time, a repeat within the batch only counts once
+        unique, first = np.unique(hashes, return_index=True)
+        seen = self._contains(unique)
+        if self._recent:
+            seen |= np.isin(unique, np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent)))
+
+        fresh = np.zeros(len(hashes), dtype=bool)
+        fresh[first[~seen]] = True
+        return fresh
+
+    def update(self, hashes: np.ndarray):
+        # hashes that are known to be new, as returned by unseen
+        self._insert(np.sort(hashes))
+
+    def hashes(self) -> np.ndarray:
+        self._merge()
+        return self._sorted
+
+    def memory_usage(self, deep=True) -> int:
+        return self._sorted.nbytes + container_size(self._recent, deep)
+
+    def _contains(self, hashes):
+        positions = np.minimum(np.searchsorted(self._sorted, hashes), max(len(self._sorted) - 1, 0))
+        return self._sorted[positions] == hashes if len(self._sorted) else np.zeros(np.shape(hashes), dtype=bool)
+
+    def _insert(self, hashes):
+        if len(hashes):
+            self._sorted = np.insert(self._sorted, np.searchsorted(self._sorted, hashes), hashes)
+
+    def _merge(self):
+        if self._recent:
+            recent = np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent))
+            self._recent = set()
+            self._insert(np.sort(recent))
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
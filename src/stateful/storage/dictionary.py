@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from stateful.utils import container_size
+
+
+class Dictionary:
+    # codes are handed out in order of first appearance and never change, so they can be shared across spaces
+
+    def __init__(self, categories=None):
+        self.categories = list(categories) if categories else []
+        self.codes = {value: code for code, value in enumerate(self.categories)}
+        # "category" or "string" once a space decided how the string stream of this name is stored
+        self.dtype = None
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.categories)
+            self.categories.append(value)
+
+        return code
+
+    def encode_many(self, values) -> np.ndarray:
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        mapping = np.array([self.encode(value) for value in uniques], dtype=np.int32)
+        return mapping[codes]
+
+    def decode(self, code):
+        return self.categories[code]
+
+    def categorical(self, codes: np.ndarray) -> pd.Categorical:
+        return pd.Categorical.from_codes(codes, categories=self.categories)
+
+    def memory_usage(self, deep=True) -> int:
+        return container_size(self.categories, deep) + container_size(self.codes)
+
+    def __len__(self):
+        return len(self.categories)
@@ -0,0 +1,242 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+
+import numpy as np
+from stateful.storage.codec import dumps, loads
+from stateful.storage.store import save_state, open_state
+
+MANIFEST = "manifest.json"
+CHECKPOINT = "checkpoint"
+LOG = re.compile(r"^log-(\d+)\.jsonl$")
+
+
+class WriteAheadLog:
+    # events are written in groups and fsynced in batches, a crash loses at most the unsynced tail
+
+    def __init__(self, path, state=None, group=256, sync_every=4096, sync_interval=1.0, checkpoint_every=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.state = state
+        self.group = group
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.checkpoint_every = checkpoint_every
+
+        self.sequence = max(log_sequences(path), default=0)
+        truncate_torn(self._log_path(self.sequence))
+        self._file = open(self._log_path(self.sequence), "ab")
+        self._pending = []
+        self._pending_events = 0
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._since_checkpoint = 0
+        self._checkpoint_due = False
+
+        # a group that does not fill up is written and synced by a background thread once sync_interval passed
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=_flush_idle, args=(weakref.ref(self), self._closed, sync_interval),
+                                         name="stateful-wal", daemon=True)
+        self._flusher.start()
+
+    @property
+    def checkpointed(self):
+        return os.path.exists(os.path.join(self.path, CHECKPOINT))
+
+    def _log_path(self, sequence):
+        return os.path.join(self.path, f"log-{sequence}.jsonl")
+
+    def append(self, key, date, event):
+        # keys and values json has no type for are tagged and come back typed, unsupported ones raise here
+        self._queue(dumps([key, date, event]), 1)
+
+    def append_many(self, key, dates, columns):
+        # a batch is one line with a list of dates and a list of values per column
+        columns = {name: _listed(values) for name, values in columns.items()}
+        self._queue(dumps([key, np.asarray(dates).tolist(), columns]), len(dates))
+
+    def _queue(self, line, events):
+        # events are logged before they are applied, a due checkpoint waits for the next event so that the
+        # snapshot holds everything logged so far
+        with self._lock:
+            if self._checkpoint_due:
+                self.checkpoint()
+
+            self._pending.append(line)
+            self._pending_events += events
+            self._since_checkpoint += events
+
+            if self._pending_events >= self.group or time.monotonic() - self._synced_at >= self.sync_interval:
+                self.commit()
+            self._checkpoint_due = bool(self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every)
+
+    def commit(self, sync=False):
+        with self._lock:
+            if not self._file.closed:
+                self._commit(sync)
+
+    def _commit(self, sync):
+        if self._pending:
+            self._file.write(("\n".join(self._pending) + "\n").encode())
+            self._file.flush()
+            self._unsynced += self._pending_events
+            self._pending, self._pending_events = [], 0
+
+        elapsed = time.monotonic() - self._synced_at
+        if self._unsynced and (sync or self._unsynced >= self.sync_every or elapsed >= self.sync_interval):
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    def flush(self):
+        self.commit(sync=True)
+
+    def rotate(self):
+        with self._lock:
+            self.flush()
+            self._file.close()
+
+            self.sequence += 1
+            self._file = open(self._log_path(self.sequence), "ab")
+            return self.sequence
+
+    def checkpoint(self):
+        with self._lock:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        # everything logged before the rotation is part of the snapshot, so those logs can go
+        sequence = self.rotate()
+        self._since_checkpoint = 0
+        self._checkpoint_due = False
+
+        directory = os.path.join(self.path, CHECKPOINT)
+        temporary, previous = f"{directory}.tmp", f"{directory}.old"
+        shutil.rmtree(temporary, ignore_errors=True)
+
+        save_state(self.state, temporary)
+        with open(os.path.join(temporary, "sequence.json"), "w") as file:
+            json.dump({"sequence": sequence}, file)
+
+        if os.path.exists(directory):
+            os.rename(directory, previous)
+        os.rename(temporary, directory)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        for old in log_sequences(self.path):
+            if old < sequence:
+                os.remove(self._log_path(old))
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            self.flush()
+            self._file.close()
+
+
+def _flush_idle(reference, closed, interval):
+    # holds the log only weakly, a log that is dropped without close stops its thread on the next wake up
+    while not closed.wait(interval):
+        log = reference()
+        if log is None:
+            return
+        log.commit()
+        del log
+
+
+def _listed(values):
+    values = np.asarray(values)
+    # tolist turns datetimes into integers, the scalars keep their type
+    return list(values) if values.dtype.kind in "mM" else values.tolist()
+
+
+def log_sequences(path):
+    return sorted(int(match.group(1)) for match in map(LOG.match, os.listdir(path)) if match)
+
+
+def truncate_torn(file, block=65536):
+    # drops a partially written last line so that appends start on a fresh line
+    if not os.path.exists(file):
+        return
+
+    with open(file, "rb+") as handle:
+        position = handle.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(position, block)
+            handle.seek(position - step)
+            newline = handle.read(step).rfind(b"\n")
+            if newline >= 0:
+                position = position - step + newline + 1
+                break
+            position -= step
+
+        handle.truncate(position)
+
+
+def write_manifest(path, state):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, MANIFEST), "w") as file:
+        json.dump({
+            "primary_key": state.primary_key,
+            "time_key": state.time_key,
+            "configuration": state.configuration,
+            "pool_timestamps": state.timestamps is not None,
+            "reorder_window": state.reorder_window,
+            "strict": state.strict,
+            "idempotent": state.idempotent
+        }, file)
+
+
+def recover_state(path, mmap=True):
+    from stateful.state import State
+
+    directory = os.path.join(path, CHECKPOINT)
+    if not os.path.exists(directory) and os.path.exists(f"{directory}.old"):
+        directory = f"{directory}.old"
+
+    if os.path.exists(directory):
+        state = open_state(directory, mmap=mmap)
+        with open(os.path.join(directory, "sequence.json")) as file:
+            sequence = json.load(file)["sequence"]
+    else:
+        with open(os.path.join(path, MANIFEST)) as file:
+            manifest = json.load(file)
+        state = State(manifest["primary_key"],
+                      manifest["time_key"],
+                      configuration=manifest["configuration"],
+                      pool_timestamps=manifest.get("pool_timestamps", False),
+                      reorder_window=manifest.get("reorder_window"),
+                      strict=manifest.get("strict", False),
+                      idempotent=manifest.get("idempotent", False))
+        sequence = 0
+
+    for number in log_sequences(path):
+        if number >= sequence:
+            replay(os.path.join(path, f"log-{number}.jsonl"), state)
+
+    return state
+
+
+def replay(file, state):
+    with open(file, "rb") as lines:
+        for line in lines:
+            try:
+                key, date, event = loads(line)
+            except ValueError:
+                # a torn write at the end of the log, nothing after it was acknowledged
+                break
+
+            key = tuple(key) if isinstance(key, list) else key
+            for name in event.keys():
+                state.graph.add(name, [])
+
+            if isinstance(date, list):
+                state.space[key].extend(date, event)
+            else:
+                event[state.time_key] = date
+                state.space[key].add(event)
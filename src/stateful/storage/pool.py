@@ -0,0 +1,138 @@
+import numpy as np
+from pandas import DatetimeIndex
+from stateful.storage.arrays import GrowableArray, to_nanoseconds, floor_positions
+from stateful.utils import container_size
+
+
+class TimestampPool:
+    # the distinct timestamps of a state, pooled streams keep int32 ids into it instead of their own int64 keys
+    __slots__ = ("dates", "ids", "generation", "_sorted", "_ranks", "_query", "_resolved")
+
+    def __init__(self, dates=None):
+        self.dates = GrowableArray(np.int64, dates)
+        self.ids = {date: id for id, date in enumerate(self.dates.data.tolist())}
+        # bumped with every new date, ranks cached for an older generation are stale
+        self.generation = 0
+        self._sorted, self._ranks = None, None
+        self._query, self._resolved = None, None
+
+    def intern(self, index) -> np.ndarray:
+        unique, inverse = np.unique(np.asarray(index, dtype=np.int64), return_inverse=True)
+        ids = np.empty(len(unique), dtype=np.int32)
+
+        new = []
+        for position, date in enumerate(unique.tolist()):
+            id = self.ids.get(date)
+            if id is None:
+                id = self.ids[date] = len(self.ids)
+                new.append(date)
+            ids[position] = id
+
+        if new:
+            assert len(self.ids) <= np.iinfo(np.int32).max, "the pool ran out of int32 ids"
+            self.dates.extend(new)
+            self.generation += 1
+            self._sorted, self._ranks = None, None
+            self._query, self._resolved = None, None
+
+        return ids[inverse.reshape(-1)]
+
+    def lookup(self, ids) -> np.ndarray:
+        return self.dates.data[ids]
+
+    def ranks(self, ids) -> np.ndarray:
+        # ids follow the order of arrival, ranks follow time so that pooled streams can be searched without lookups
+        if self._ranks is None:
+            order = np.argsort(self.dates.data, kind="stable")
+            self._sorted = self.dates.data[order]
+            self._ranks = np.empty(len(order), dtype=np.int32)
+            self._ranks[order] = np.arange(len(order), dtype=np.int32)
+
+        return self._ranks[ids]
+
+    def rank(self, date: int, side="right") -> int:
+        # the number of pooled dates before date, on the right side the date itself counts as well
+        self.ranks([])
+        return int(np.searchsorted(self._sorted, date, side=side))
+
+    def resolve(self, dates) -> np.ndarray:
+        # the floor rank of every query date, a grid that is read for every space is resolved once
+        if dates is self._query:
+            return self._resolved
+
+        self.ranks([])
+        resolved = floor_positions(self._sorted, to_nanoseconds(dates))
+        if isinstance(dates, DatetimeIndex):
+            self._query, self._resolved = dates, resolved
+
+        return resolved
+
+    def memory_usage(self, deep=True) -> int:
+        size = self.dates.nbytes + container_size(self.ids, deep)
+        if self._ranks is not None:
+            size += self._ranks.nbytes + self._sorted.nbytes
+        return size
+
+    def __len__(self):
+        return len(self.dates)
+
+
+class PooledArray:
+    # the growable index of a pooled stream, it reads like an int64 array of nanoseconds
+    __slots__ = ("pool", "ids", "_ranks", "_generation")
+    dtype = np.dtype(np.int64)
+
+    def __init__(self, pool: TimestampPool, data=None):
+        self.pool = pool
+        self.ids = GrowableArray(np.int32, None if data is None else pool.intern(data))
+        self._ranks, self._generation = None, None
+
+    @property
+    def data(self) -> np.ndarray:
+        return self.pool.lookup(self.ids.data)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + (self._ranks.nbytes if self._ranks is not None else 0)
+
+    def memory_usage(self, deep=False) -> int:
+        return self.nbytes
+
+    def ranks(self) -> np.ndarray:
+        # cached until the array or the pool changes, so that point reads are a binary search
+        if self._ranks is None or self._generation != self.pool.generation:
+            self._ranks, self._generation = self.pool.ranks(self.ids.data), self.pool.generation
+        return self._ranks
+
+    def floor(self, date: int) -> int:
+        # the rank is searched as an int32, a python int would cast the whole array first
+        return int(np.searchsorted(self.ranks(), np.int32(self.pool.rank(date, side="right")), side="left")) - 1
+
+    def ceil(self, date: int) -> int:
+        return int(np.searchsorted(self.ranks(), np.int32(self.pool.rank(date, side="left")), side="left"))
+
+    def extend(self, values):
+        self.ids.extend(self.pool.intern(values))
+        self._ranks = None
+
+    def truncate(self, size):
+        self.ids.truncate(size)
+        self._ranks = None
+
+    def discard(self, count):
+        self.ids.discard(count)
+        self._ranks = None
+
+    def shrink(self):
+        self.ids.shrink()
+
+    def __getitem__(self, item):
+        return self.pool.lookup(self.ids[item])
+
+    def __setitem__(self, item, value):
+        ids = self.pool.intern(np.atleast_1d(value))
+        self.ids[item] = ids if np.ndim(value) else ids[0]
+        self._ranks = None
+
+    def __len__(self):
+        return len(self.ids)
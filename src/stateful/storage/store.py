@@ -0,0 +1,237 @@
+import json
+import os
+from collections import defaultdict
+
+import numpy as np
+from stateful.storage.arrays import GrowableArray, CodedArray, storage_dtype, to_scalar
+from stateful.storage.codec import encode_column, dumps, loads, json_default, json_object
+from stateful.storage.columnar import ColumnarTree
+from stateful.storage.dictionary import Dictionary
+from stateful.storage.pool import PooledArray
+from stateful.storage.stream import Stream
+
+FORMAT = 2
+METADATA = "metadata.json"
+INDEX = "index.npy"
+COLUMNS = ("index", "values", "valid", "change_index", "change_values", "change_valid")
+OFFSETS = ("owners", "lengths", "ends", "events", "changes")
+
+
+def save_state(state, path):
+    os.makedirs(path, exist_ok=True)
+
+    keys, lengths, indexes = [], [], []
+    segments = defaultdict(list)
+    for owner, (key, space) in enumerate(state.all_spaces.items()):
+        keys.append(to_scalar(key))
+        lengths.append(space.length)
+        if space.index is not None:
+            indexes.append(space.index.hashes())
+
+        for name, stream in space.controller.streams.items():
+            if isinstance(stream, Stream) and not stream.empty:
+                configuration = json.dumps(stream.configuration, sort_keys=True)
+                segments[(name, stream.dtype, configuration)].append((owner, stream.tree))
+
+    metadata = []
+    for number, ((name, dtype, configuration), trees) in enumerate(segments.items()):
+        write_segment(os.path.join(path, str(number)), trees, dtype)
+        metadata.append({"name": name, "dtype": dtype, "path": str(number), "configuration": json.loads(configuration)})
+
+    if indexes:
+        # the dedup hashes of all spaces in one file, the counts in the metadata split it again
+        np.save(os.path.join(path, INDEX), np.concatenate(indexes))
+
+    with open(os.path.join(path, METADATA), "w") as file:
+        json.dump({
+            "format": FORMAT,
+            "primary_key": state.primary_key,
+            "time_key": state.time_key,
+            "configuration": state.configuration,
+            "pool_timestamps": state.timestamps is not None,
+            "reorder_window": state.reorder_window,
+            "strict": state.strict,
+            "idempotent": state.idempotent,
+            "keys": [name for name, dependencies in state.graph.execution_order(None) if not dependencies],
+            "dictionaries": {name: dictionary.categories for name, dictionary in state.dictionaries.items()},
+            "spaces": keys,
+            "lengths": lengths,
+            "indexes": [len(index) for index in indexes],
+            "segments": metadata
+        }, file, default=json_default)
+
+
+def write_segment(directory, trees, dtype):
+    # the streams of one name are concatenated, the offsets tell which slice belongs to which space
+    os.makedirs(directory, exist_ok=True)
+
+    columns = {column: [] for column in COLUMNS}
+    offsets = {column: [] for column in OFFSETS}
+    events, changes = 0, 0
+
+    for owner, tree in trees:
+        index, values, valid = tree.arrays()
+        change_index, change_values, change_valid = tree.change_arrays()
+
+        if tree.storage == "events":
+            columns["index"].append(index)
+            columns["values"].append(values)
+            columns["valid"].append(valid)
+            events += len(index)
+
+        columns["change_index"].append(change_index)
+        columns["change_values"].append(change_values)
+        columns["change_valid"].append(change_valid)
+        changes += len(change_index)
+
+        offsets["owners"].append(owner)
+        offsets["lengths"].append(len(tree))
+        offsets["ends"].append(tree.end.value)
+        offsets["events"].append(events)
+        offsets["changes"].append(changes)
+
+    dtypes = {"index": np.int64, "values": storage_dtype(dtype), "valid": bool}
+    for column, parts in columns.items():
+        array = np.concatenate(parts) if parts else np.empty(0, dtype=dtypes[column.replace("change_", "")])
+        if array.dtype == object:
+            # object columns are written as codes and a json vocabulary, nothing in a store is pickled
+            valid = np.concatenate(columns[column.replace("values", "valid")]) if parts else np.empty(0, dtype=bool)
+            array, vocabulary = encode_column(array, valid)
+            with open(os.path.join(directory, f"{column}.json"), "w") as file:
+                file.write(dumps(vocabulary))
+        np.save(os.path.join(directory, f"{column}.npy"), array)
+
+    for column, values in offsets.items():
+        values = [0] + values if column in {"events", "changes"} else values
+        np.save(os.path.join(directory, f"{column}.npy"), np.array(values, dtype=np.int64))
+
+
+def open_state(path, mmap=True):
+    from stateful.state import State
+
+    metadata = _metadata(path)
+    state = State(metadata["primary_key"],
+                  metadata["time_key"],
+                  configuration=metadata["configuration"],
+                  stream_name=set(metadata["keys"]),
+                  pool_timestamps=metadata.get("pool_timestamps", False),
+                  reorder_window=metadata.get("reorder_window"),
+                  strict=metadata.get("strict", False),
+                  idempotent=metadata.get("idempotent", False))
+    return merge_state(state, path, mmap=mmap, metadata=metadata)
+
+
+def merge_state(state, path, mmap=True, metadata=None):
+    # adds the spaces saved at path to state, categories are recoded and streams a space already has are extended
+    metadata = _metadata(path) if metadata is None else metadata
+    for name in metadata["keys"]:
+        state.graph.add(name, [])
+
+    recodes = {}
+    for name, categories in metadata["dictionaries"].items():
+        dictionary = state.dictionaries.setdefault(name, Dictionary())
+        codes = dictionary.encode_many(categories) if categories else np.empty(0, dtype=np.int32)
+        if not np.array_equal(codes, np.arange(len(categories))):
+            recodes[name] = codes
+
+    spaces = []
+    for key, length in zip(metadata["spaces"], metadata["lengths"]):
+        key = tuple(key) if isinstance(key, list) else key
+        state._ensure(key)
+        state.all_spaces[key].length += length
+        spaces.append(state.all_spaces[key])
+
+    if metadata.get("indexes") and state.idempotent:
+        hashes = np.load(os.path.join(path, INDEX))
+        bounds = np.cumsum([0] + metadata["indexes"])
+        for position, space in enumerate(spaces):
+            space.index.add_many(hashes[bounds[position]:bounds[position + 1]])
+
+    for segment in metadata["segments"]:
+        streams = read_segment(os.path.join(path, segment["path"]),
+                               segment["name"],
+                               segment["dtype"],
+                               segment["configuration"],
+                               state.dictionaries,
+                               mmap=mmap,
+                               recode=recodes.get(segment["name"]),
+                               pool=state.timestamps)
+        for owner, stream in streams:
+            stream.configuration = state.configuration.get(stream.name, stream.configuration)
+
+            existing = spaces[owner].controller.streams.get(stream.name)
+            if isinstance(existing, Stream) and not existing.empty:
+                existing.extend(stream.tree.arrays()[0], np.asarray(stream.values(), dtype=object))
+            else:
+                spaces[owner].controller.add_stream(stream.name, stream)
+
+    return state
+
+
+def _metadata(path):
+    with open(os.path.join(path, METADATA)) as file:
+        metadata = json.load(file, object_hook=json_object)
+    assert metadata["format"] == FORMAT, f"{path} was written in format {metadata['format']}, expected {FORMAT}"
+    return metadata
+
+
+def read_segment(directory, name, dtype, configuration, dictionaries, mmap=True, recode=None, pool=None):
+    columns = {column: _load(directory, column, mmap) for column in COLUMNS}
+    owners, lengths, ends, events, changes = [_load(directory, column, False).tolist() for column in OFFSETS]
+
+    if recode is not None and dtype == "category":
+        # codes of another state's dictionary, missing slots hold 0 and stay masked
+        columns["values"], columns["change_values"] = recode[columns["values"]], recode[columns["change_values"]]
+
+    dictionary = dictionaries.setdefault(name, Dictionary())
+    if dictionary.dtype is None and dtype in ("category", "string"):
+        dictionary.dtype = dtype
+    arguments = dict(ColumnarTree.arguments(configuration), dtype=dtype)
+
+    for position, owner in enumerate(owners):
+        change_slice = slice(changes[position], changes[position + 1])
+        change_arrays = [_view(columns[column], change_slice) for column in COLUMNS[3:]]
+        if pool is not None:
+            # the saved dates are nanoseconds, they are interned into the pool of the state they are read into
+            change_arrays[0] = PooledArray(pool, change_arrays[0].data)
+
+        if arguments.get("storage", "events") == "changes":
+            arrays = change_arrays
+        else:
+            event_slice = slice(events[position], events[position + 1])
+            arrays = [_view(columns[column], event_slice) for column in COLUMNS[:3]]
+            if pool is not None:
+                arrays[0] = PooledArray(pool, arrays[0].data)
+
+        tree = ColumnarTree(name,
+                            arrays=(*arrays, *change_arrays),
+                            dictionary=dictionary,
+                            length=lengths[position],
+                            end=ends[position],
+                            pool=pool,
+                            **arguments)
+        yield owner, Stream(name, configuration=dict(configuration), dtype=tree.dtype, tree=tree, dictionary=dictionary,
+                            pool=pool)
+
+
+def _load(directory, column, mmap):
+    # copy on write keeps the file untouched when a reopened stream is appended to
+    array = np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="c" if mmap else None)
+
+    vocabulary = os.path.join(directory, f"{column}.json")
+    if os.path.exists(vocabulary):
+        with open(vocabulary) as file:
+            values = loads(file.read())
+        decoded = np.empty(len(values), dtype=object)
+        decoded[:] = values
+        return array, decoded
+
+    return array
+
+
+def _view(column, positions):
+    if isinstance(column, tuple):
+        codes, vocabulary = column
+        return CodedArray(GrowableArray(codes.dtype, codes[positions]), vocabulary)
+
+    return GrowableArray(column.dtype, column[positions])
@@ -4,37 +4,78 @@ import numpy as np
 import pandas as pd
 from pandas import DatetimeIndex
 from stateful.representable import Representable
+from stateful.storage.arrays import to_nanoseconds
+from stateful.storage.base import TreeBase, MEMORY_COMPONENTS
+from stateful.storage.columnar import ColumnarTree
+from stateful.storage.dictionary import Dictionary
+from stateful.storage.pool import TimestampPool
 from stateful.storage.tree import DateTree
-from stateful.utils import list_of_instance, cast_output
+from stateful.utils import list_of_instance, cast_output, is_missing, shallow_size
 from pandas.api.types import infer_dtype
 
+BACKENDS = {"tree": DateTree, "columnar": ColumnarTree}
+CATEGORY_RATIO = 0.5
+
+
+def string_dtype(dictionary, states) -> str:
+    # the first batch of a stream name decides for every space of the state, only a repetitive batch is encoded
+    if dictionary.dtype is None:
+        dictionary.dtype = "category" if len(set(states)) <= CATEGORY_RATIO * len(states) else "string"
+    return dictionary.dtype
 
-class Stream(Representable):
 
-    def __init__(self, name, configuration: dict = None, dtype=None, tree: Optional[DateTree] = None):
+# below this many events the array path costs more than adding them one by one
+SMALL_BATCH = 8
+
+
+class Stream(Representable):
+    __slots__ = ("name", "dtype", "_tree", "configuration", "dictionary", "pool")
+
+    def __init__(self,
+                 name,
+                 configuration: dict = None,
+                 dtype=None,
+                 tree: Optional[TreeBase] = None,
+                 dictionary: Optional[Dictionary] = None,
+                 pool: Optional[TimestampPool] = None):
         Representable.__init__(self)
         self.name = name
         self.dtype = dtype if dtype else configuration.get("dtype")
         self._tree = tree
         self.configuration = configuration if configuration else {}
+        self.dictionary = dictionary
+        self.pool = pool
 
     @property
     def length(self):
         return len(self._tree) if self._tree else None
 
+    @property
+    def backend(self):
+        backend = self.configuration.get("backend", "tree" if self.pool is None else "columnar")
+        assert backend in BACKENDS, f"{backend} is not a known backend, use one of {list(BACKENDS)}"
+        return BACKENDS[backend]
+
     @property
     def tree(self):
         if self._tree is None:
-            self._tree = DateTree(self.name, self.dtype)
+            self._tree = self.backend(self.name, self.dtype, **self._options)
         return self._tree
 
+    @property
+    def _options(self):
+        options = {"dictionary": self.dictionary}
+        if self.pool is not None and self.backend.pooled:
+            options["pool"] = self.pool
+        return options
+
     @property
     def interpolation(self):
         return self.tree.interpolation
 
     @property
     def empty(self):
-        return not (self.tree is not None and not self.tree.empty)
+        return self._tree is None or self._tree.empty
 
     @property
     def start(self):
@@ -93,7 +134,7 @@ class Stream(Representable):
             return pd.DataFrame(columns={self.name: values}, index=index)
 
     def alias(self, name):
-        return Stream(name, self.configuration, self.dtype, self._tree.alias(name), self.function, self.frozen)
+        return Stream(name, self.configuration, self.dtype, self._tree.alias(name), self.dictionary, self.pool)
 
     def values(self):
         return self.tree.values()
@@ -120,17 +161,68 @@ class Stream(Representable):
             return self.tree.all(dates)
 
     def add(self, date, state):
-        if pd.isna(state) and self.empty:
+        if is_missing(state) and self.empty:
             return
 
-        if self.dtype is None:
-            self.dtype = infer_dtype([state])
-
         if self._tree is None or self._tree.empty:
-            self._tree = DateTree.from_example(self.name, self.configuration, date, example=state)
+            self.dtype = self._infer_dtype([state])
+            self.configuration.setdefault("dtype", self.dtype)
+
+            self._tree = self.backend.from_example(self.name, self.configuration, date, example=state, **self._options)
+            self.dtype = self._tree.dtype
         else:
             self._tree.add(date, state)
 
+    def extend(self, dates, states):
+        if not (isinstance(states, np.ndarray) and states.dtype.kind in "iufb"):
+            # numeric columns stay typed all the way to the storage arrays
+            states = np.asarray(states, dtype=object)
+        dates = to_nanoseconds(dates)
+
+        if len(dates) <= SMALL_BATCH and not self.empty:
+            for date, state in zip(dates.tolist(), states):
+                self._tree.add(date, state)
+        elif self.empty:
+            valid = ~pd.isna(states)
+            if not valid.any():
+                return
+
+            first = np.argmax(valid)
+            dates, states = dates[first:], states[first:]
+
+            self.dtype = self._infer_dtype(states)
+            self.configuration.setdefault("dtype", self.dtype)
+
+            arguments = self.backend.arguments(self.configuration)
+            self._tree = self.backend.from_arrays(dates, states, name=self.name, **self._options, **arguments)
+            self.dtype = self._tree.dtype
+        else:
+            self._tree.extend(dates, states)
+
+    def memory_usage(self, deep=True) -> pd.Series:
+        usage = dict.fromkeys(MEMORY_COMPONENTS, 0)
+        if self._tree is not None:
+            usage.update(self._tree.memory_usage(deep))
+        usage["objects"] += shallow_size(self)
+
+        return pd.Series(usage, name=self.name)
+
+    def compact(self, older_than, freq="1d", how="last") -> int:
+        if self.empty:
+            return 0
+
+        return self.tree.compact(older_than, freq=freq, how=how)
+
+    def _infer_dtype(self, states):
+        if "dtype" in self.configuration:
+            return self.configuration["dtype"]
+
+        dtype = self.dtype if self.dtype else infer_dtype(states[:1])
+        if dtype == "string" and self.dictionary is not None:
+            return string_dtype(self.dictionary, states)
+
+        return dtype
+
     """
     List methods
     """
@@ -165,7 +257,6 @@ class Stream(Representable):
         ])
 
         if type_check:
-            for d, s in zip(date, state):
-                self.add(d, s)
+            self.extend(date, state)
         else:
             self.add(date, state)
\ No newline at end of file
@@ -1,25 +1,32 @@
+from datetime import timezone
+from functools import partial
 from typing import List, Optional
 
 from pandas import DatetimeIndex
 from stateful.event.event import Event
 from stateful.event.event_frame import EventFrame
+from stateful.storage.arrays import to_nanosecond, to_timestamp
+from stateful.storage.dictionary import Dictionary
 from stateful.storage.stream import Stream
 from stateful.utils import list_of_instance, cast_output
 from pandas.api.types import infer_dtype
 
 import pandas as pd
 import numpy as np
-import redblackpy as rb
 
 
 class StreamController:
+    __slots__ = ("graph", "configuration", "dictionaries", "pool", "streams", "_steps", "_source")
 
-    def __init__(self, graph, configuration):
+    def __init__(self, graph, configuration, dictionaries=None, pool=None):
         from stateful.storage.stream_graph import StreamGraph
         self.graph: StreamGraph = graph
         self.configuration = configuration
+        self.dictionaries = dictionaries if dictionaries is not None else {}
+        self.pool = pool
 
         self.streams = {}
+        self._steps, self._source = None, None
 
     @property
     def data_streams(self):
@@ -45,7 +52,7 @@ class StreamController:
         if list_of_instance(key, str):
             key = "_".join(key)
         stream_conf = self.configuration.get(key, {})
-        stream_conf['on_dublicate'] = 'increment'
+        stream_conf.setdefault('on_dublicate', 'increment')
         return stream_conf
 
     def add_stream(self, name, stream, dependencies: Optional[List[str]] = None):
@@ -56,68 +63,88 @@ class StreamController:
 
         self.graph.add(name, dependencies)
         self.streams[name] = stream
+        self._steps = None
 
     def ensure_stream(self, key, value=None):
         self.graph.add(key, [])
 
         if key not in self.streams:
             configuration = self._stream_conf(key)
-            dtype = configuration.get("dtype", infer_dtype([value]) if value else None)
-            self.add_stream(key, Stream(name=key, dtype=dtype, configuration=configuration))
-
-    def get(self, date, columns=None, cast=True):
+            dtype = configuration.get("dtype")
+            if dtype is None and value:
+                dtype = infer_dtype([value])
+            dictionary = self.dictionaries.setdefault(key, Dictionary())
+            stream = Stream(name=key, dtype=dtype, configuration=configuration, dictionary=dictionary, pool=self.pool)
+            self.add_stream(key, stream)
+
+    def steps(self, columns=None) -> list:
+        # the plan of the graph bound to the streams of this space, rebuilt when either of them changes
+        plan = self.graph.plan(columns)
+        if columns or self._steps is None or plan is not self._source:
+            steps = [self._step(name, dependencies) for name, dependencies in plan]
+            if columns:
+                return steps
+            self._steps, self._source = steps, plan
+
+        return self._steps
+
+    def _step(self, name, dependencies):
         from stateful.storage.calculated_stream import CalculatedStream
 
-        state = Event(date, state={})
-        for name, dependencies in self.graph.execution_order(columns):
-            if name in self.streams:
-                if dependencies:
-                    assert isinstance(self.streams[name], CalculatedStream)
+        stream = self.streams.get(name)
+        if stream is not None and dependencies:
+            assert isinstance(stream, CalculatedStream)
+        if stream is not None and stream.dtype:
+            cast = partial(cast_output, stream.dtype)
+        elif stream is not None:
+            # the dtype of a stream without values is only known after its first event
+            cast = partial(_late_cast, stream)
+        else:
+            cast = None
+
+        return name, dependencies, stream, cast
 
-                    state[name] = self.streams[name].calculate(state[dependencies], name)
-                else:
-                    state[name] = self.streams[name].get(date, cast=False)
+    def get(self, date, columns=None, cast=True):
+        values = {}
+        nanoseconds = to_nanosecond(date)
+        # the streams are read by nanosecond, the event carries a utc timestamp whatever the date was given as
+        if not (isinstance(date, pd.Timestamp) and date.tz is timezone.utc):
+            date = to_timestamp(nanoseconds)
+        steps = self.steps(columns)
+        for name, dependencies, stream, _ in steps:
+            if stream is None:
+                values[name] = np.NaN
+            elif dependencies:
+                # the plan is in topological order, every dependency already has its value
+                values[name] = stream.calculate(Event(date, {key: values[key] for key in dependencies}), name)
             else:
-                state[name] = np.NaN
-
-        if not columns:
-            for name in self.keys:
-                if name not in state.keys():
-                    state[name] = np.NaN
+                values[name] = stream.get(nanoseconds, cast=False)
 
         if cast:
-            for name, stream in state.items():
-                if name in self.streams:
-                    state[name] = cast_output(self.streams[name].dtype, state[name])
+            for name, _, _, cast_function in steps:
+                if cast_function is not None:
+                    values[name] = cast_function(values[name])
 
-        return state
+        return Event(date, state=values)
 
     def all(self, dates=None, columns=None, cast=True):
-        from stateful.storage.calculated_stream import CalculatedStream
-
-        if not dates:
+        if dates is None or not len(dates):
             dates = DatetimeIndex(list(self))
 
         state = EventFrame(dates)
-        for name, dependencies in self.graph.execution_order(columns):
-            if name not in self.streams:
+        steps = self.steps(columns)
+        for name, dependencies, stream, _ in steps:
+            if stream is None:
                 state.add_column(state.empty_col(name, size=len(state)))
+            elif dependencies:
+                state.add_column(stream.calculate(state[dependencies], name))
             else:
-                stream = self.streams[name]
-                if dependencies:
-                    assert isinstance(stream, CalculatedStream)
-                    state.add_column(stream.calculate(state[dependencies], name))
-                else:
-                    state.add_column(stream.all(dates, cast=False))
-
-        for name in self.keys:
-            if name not in state:
-                state.add_column(state.empty_col(name, size=len(state)))
+                state.add_column(stream.all(dates, cast=False))
 
         if cast:
-            for name, column in state.items():
-                if name in self.streams:
-                    state[name] = column.cast(self.streams[name].dtype)
+            for name, _, stream, _ in steps:
+                if stream is not None:
+                    state[name] = state[name].cast(stream.dtype)
 
         return state
 
@@ -138,8 +165,12 @@ class StreamController:
             return iter([])
         else:
             self.on(True)
-            iterables = []
+            dates = set()
             for stream in self.data_streams:
-                iterables += stream.tree.iterable()
+                dates.update(stream.dates())
+
+            return iter(sorted(dates))
+
 
-            return rb.SeriesIterator(iterables)() if iterables else iter([])
+def _late_cast(stream, value):
+    return cast_output(stream.dtype, value)
@@ -9,6 +9,11 @@ class StreamGraph:
         self.DAG = nx.DiGraph()
         self.DAG.add_node(self.__root__)
 
+        # every change of the graph bumps the version, plans compiled for an older version are dropped
+        self.version = 0
+        self._plans = {}
+        self._planned = 0
+
         for name in stream_names:
             self.add(name, [])
 
@@ -18,15 +23,18 @@ class StreamGraph:
 
         if name not in self.DAG.nodes:
             self.DAG.add_node(name)
+            self.version += 1
 
         if not dependencies:
-
-            self.DAG.add_edge(self.__root__, name)
+            if not self.DAG.has_edge(self.__root__, name):
+                self.DAG.add_edge(self.__root__, name)
+                self.version += 1
         else:
             for dependency in dependencies:
                 assert dependency in self.keys, f"Dependency {dependency} is not known"
                 if not self.DAG.has_edge(dependency, name):
                     self.DAG.add_edge(dependency, name)
+                    self.version += 1
 
     def _target_columns(self, columns):
         required_columns = set()
@@ -41,24 +49,36 @@ class StreamGraph:
 
         return required_columns
 
-    def execution_order(self, columns):
+    def plan(self, columns=None) -> tuple:
+        # the steps for a set of columns are compiled once per version of the graph and shared by every space
+        if self._planned != self.version:
+            self._plans.clear()
+            self._planned = self.version
+
+        key = frozenset(columns) if columns else None
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = self._compile(columns)
+        return plan
+
+    def _compile(self, columns) -> tuple:
+        # stored streams come first, calculated streams follow in topological order after their dependencies
         required_columns = set(self.DAG.nodes) if not columns else self._target_columns(columns)
+        required_columns.discard(self.__root__)
 
-        state = set()
-        for name in self.DAG.successors(self.__root__):
-            if name in required_columns and name != self.__root__:
-                state.add(name)
-                yield name, []
+        roots = [name for name in self.DAG.successors(self.__root__) if name in required_columns]
+        steps = [(name, []) for name in roots]
 
-        missing_streams = [name for name in required_columns if name not in state and name != self.__root__]
-        while missing_streams:
-            for name in missing_streams:
+        roots = set(roots)
+        for name in nx.topological_sort(self.DAG):
+            if name in required_columns and name not in roots:
                 dependencies = [dependency for dependency in self.DAG.predecessors(name) if dependency != self.__root__]
-                if all([dependency in state for dependency in dependencies]):
-                    state.add(name)
-                    yield name, dependencies
+                steps.append((name, dependencies))
+
+        return tuple(steps)
 
-            missing_streams = [node for node in self.DAG.nodes if node not in state and node != self.__root__]
+    def execution_order(self, columns):
+        return iter(self.plan(columns))
 
     def __contains__(self, item):
         return item in self.keys
@@ -1,14 +1,22 @@
-from datetime import timedelta
-
 import redblackpy as rb
-import pandas as pd
 from pandas import DatetimeIndex
-from pandas.api.types import infer_dtype
 import numpy as np
 from stateful.event.event_column import EventColumn
+from stateful.storage.arrays import to_nanosecond, to_nanoseconds, to_timestamp, floor_values, floor_positions, \
+    interpolate, change_mask, same_value, to_scalar, storage_dtype, object_size
+from stateful.storage.base import TreeBase
+from stateful.utils import shallow_size, container_size
+
+# shared by all trees without missing values until they get one
+NO_MISSING = frozenset()
+
+# redblackpy does not report its size, a node holds its key, three links and a color next to the value
+NODE_SIZE = 40
 
 
-class DateTree:
+class DateTree(TreeBase):
+    __slots__ = ("_iter", "_arrays", "_change_arrays", "_collisions", "_missing", "_tree", "_change_tree", "length",
+                 "_end")
 
     def __init__(self,
                  name,
@@ -19,211 +27,340 @@ class DateTree:
                  on_dublicate="increment",
                  tree=None,
                  change_tree=None,
-                 backup_index=None):
-        self.name = name
-        self.dtype = dtype
-        self.on_dublicate = on_dublicate
-        self.interpolation = interpolation
-
-        if not backup_index:
-            if index:
-                self._backup_index = {idx: value for idx, value in zip(index, values)}
-            else:
-                self._backup_index = {}
-        else:
-            self._backup_index = backup_index
-
-        self._iter = iter([])
-
-        if tree is None:
-            self._tree = rb.Series(dtype=self._infer_dtype(self.dtype),
-                                   index=index,
-                                   values=values,
-                                   interpolate=interpolation)
-        else:
+                 missing=None,
+                 dictionary=None,
+                 storage="events",
+                 retention=None,
+                 max_events=None,
+                 baseline=False):
+        TreeBase.__init__(self, name, dtype, interpolation=interpolation, on_dublicate=on_dublicate,
+                          dictionary=dictionary, storage=storage, retention=retention, max_events=max_events,
+                          baseline=baseline)
+
+        self._iter = None
+        self._arrays, self._change_arrays = None, None
+        self._collisions = None
+        self._missing = NO_MISSING if missing is None else missing
+
+        self._change_tree = rb.Series(dtype=self._infer_dtype(self.dtype), interpolate="floor") \
+            if change_tree is None else change_tree
+        if tree is not None:
             self._tree = tree
-
-        if change_tree is None:
-            if index is not None and values is not None:
-                change_idx, change_vals = [], []
-                for idx, value in zip(index, values):
-                    if not change_vals or change_vals[-1] != value:
-                        change_idx.append(idx)
-                        change_vals.append(value)
-            else:
-                change_idx, change_vals = None, None
-
-            self._change_tree = rb.Series(dtype=self._infer_dtype(self.dtype),
-                                          index=change_idx,
-                                          values=change_vals,
-                                          interpolate="floor")
-        else:
-            self._change_tree = change_tree
-
-        if index is not None:
-            self.length = len(index)
-        elif tree is not None:
-            self.length = len(tree)
+        elif storage == "changes":
+            # repeated values are dropped on insert, the change points are all that is kept
+            self._tree = self._change_tree
         else:
-            self.length = 0
+            self._tree = rb.Series(dtype=self._infer_dtype(self.dtype), interpolate=interpolation)
 
-    @property
-    def empty(self):
-        return self.length == 0
+        self.length = len(self._tree)
+        self._end = self._tree.end() if self.length else None
 
-    @property
-    def default(self):
-        if self.dtype in {"integer", "floating"}:
-            return 0
-        elif self.dtype == "boolean":
-            return False
-        else:
-            return np.NaN
+        if index is not None and values is not None:
+            for date, value in zip(to_nanoseconds(index).tolist(), values):
+                self.add(date, value)
 
     @property
     def start(self):
-        return self._tree.begin() if not self.empty else None
+        return to_timestamp(self._tree.begin()) if not self.empty else None
 
     @property
     def end(self):
-        return self._tree.end() if not self.empty else None
-
-    @property
-    def first(self):
-        if self.empty:
-            return self.default
-
-        return self.get(self.start)
-
-    @property
-    def last(self):
-        if self.empty:
-            return self.default
-
-        return self.get(self.end)
-
-    @staticmethod
-    def from_example(name, configuration, date, example):
-        if "dtype" not in configuration:
-            configuration["dtype"] = infer_dtype([example])
-        tree = DateTree(name, index=[pd.to_datetime(date, utc=True)], values=[example], **configuration)
-        return tree
+        return to_timestamp(self._end) if not self.empty else None
 
     def iterable(self):
         return [self._tree] if not self.empty else []
 
     def alias(self, name):
-        return DateTree(name,
+        tree = DateTree(name,
                         dtype=self.dtype,
                         interpolation=self.interpolation,
                         on_dublicate=self.on_dublicate,
                         tree=self._tree,
                         change_tree=self._change_tree,
-                        backup_index=self._backup_index)
+                        missing=self._missing,
+                        dictionary=self.dictionary,
+                        storage=self.storage,
+                        **self.retention_arguments())
+        tree.length, tree._end = self.length, self._end
+        return tree
 
     def values(self):
-        return self._tree.values()
+        return [self._output(date, value) for date, value in zip(self._tree.index(), self._tree.values())]
 
     def dates(self):
-        return list(self._tree.index())
-
-    def _safe_get(self, date):
-        if date in self._backup_index:
-            return self._backup_index[date]
-        else:
-            return self._tree[date]
+        return [to_timestamp(date) for date in self._tree.index()]
 
     def get(self, date):
         if self.empty:
             return self.default
 
-        date = pd.to_datetime(date, utc=True)
+        date = to_nanosecond(date)
 
-        if self.start > date:
+        if self._tree.begin() > date:
             result = self.default
-        elif self.end < date:
+        elif self._tree.end() < date:
             if self.interpolation != "floor":
                 result = self.default
             else:
-                result = self.last
+                result = self._output(*self._change_tree.floor(date))
+        elif self.interpolation == "linear":
+            (left, left_value), (right, right_value) = self._tree.floor(date), self._tree.ceil(date)
+            if left in self._missing or right in self._missing:
+                return np.NaN
+            index, values = np.array([left, right], dtype=np.int64), np.array([left_value, right_value])
+            result = to_scalar(interpolate(index, values, np.array([date], dtype=np.int64))[0])
         else:
-            result = self._safe_get(date)
+            result = self._output(*self._change_tree.floor(date))
 
         return result
 
-    def all(self, dates: DatetimeIndex):
-        start, end = self.start, self.end
+    def _output(self, date, value):
+        if date in self._missing:
+            return np.NaN
 
-        before, during, after = start > dates, (start <= dates) & (end >= dates), end < dates
+        return self.output(value)
 
-        if self.dtype == "string":
-            dtype = f"object"
+    def all(self, dates: DatetimeIndex):
+        if self.dtype == "category":
+            index, codes, valid = self.change_arrays()
+            values = self._categorical(floor_positions(index, to_nanoseconds(dates)), codes, valid)
+        elif self.interpolation == "linear":
+            index, stored_values, valid = self.arrays()
+            query = to_nanoseconds(dates)
+
+            values = interpolate(index, stored_values, query, valid=valid)
+            values[(query < index[0]) | (query > index[-1])] = self.default
         else:
-            dtype = self._infer_dtype(self.dtype)
+            index, change_values, valid = self.change_arrays()
+            values = floor_values(index, change_values, to_nanoseconds(dates), self.default, valid=valid)
 
-        values = np.empty(len(dates), dtype=dtype)
-        if self.interpolation == "linear":
-            values[np.argwhere(before)] = self.default
-            values.flat[np.argwhere(during)] = [self._safe_get(date) for date in dates[during]]
-            values[np.argwhere(after)] = self.default
-        else:
-            values[np.argwhere(before)] = self.default
-            values.flat[np.argwhere(during)] = [self._change_tree[date] for date in dates[during]]
-            values[np.argwhere(after)] = self.last
+        return EventColumn(name=self.name, dates=dates, events=values, dtype=self.dtype)
 
-        return EventColumn(name=self.name, dates=dates, events=values)
+    def arrays(self):
+        if self._tree is self._change_tree:
+            return self.change_arrays()
 
-    def _safe_add(self, date, value):
-        previous_value = self.floor(date)
-        if value != previous_value:
-            self._change_tree[date] = value
+        if self._arrays is None:
+            self._arrays = self._snapshot(self._tree)
 
-        self._tree[date] = value
+        return self._arrays
 
-        if self.interpolation == "linear":
-            self._backup_index[date] = value
+    def change_arrays(self):
+        if self._change_arrays is None:
+            self._change_arrays = self._snapshot(self._change_tree)
 
-        self.length += 1
+        return self._change_arrays
 
-    def add(self, date, value):
-        date = pd.to_datetime(date, utc=True)
-        value = self.cast_input(value)
-        try:
-            self._safe_add(date, value)
-        except KeyError:
-            if self.on_dublicate == "increment":
-                date = date + timedelta(seconds=1)
-                self.add(date, value)
+    def memory_usage(self, deep=True) -> dict:
+        node = NODE_SIZE + np.dtype(storage_dtype(self.dtype)).itemsize
+
+        def tree_size(tree):
+            size = len(tree) * node
+            if deep and not self.typed:
+                size += object_size(np.fromiter(tree.values(), dtype=object, count=len(tree)))
+            return size
 
-    def cast_input(self, value):
-        if pd.isna(value):
-            return value
+        cached = [array for arrays in (self._arrays, self._change_arrays) if arrays is not None for array in arrays]
+        return {
+            "events": 0 if self._tree is self._change_tree else tree_size(self._tree),
+            "changes": tree_size(self._change_tree),
+            "missing": container_size(self._missing, deep),
+            "buffer": 0,
+            "cache": sum(array.nbytes + (object_size(array) if deep else 0) for array in cached),
+            "objects": shallow_size(self) + shallow_size(self._tree) + shallow_size(self._change_tree) +
+            (container_size(self._collisions, deep) if self._collisions is not None else 0)
+        }
 
-        if self.dtype == "integer":
-            return int(value)
-        elif self.dtype == "boolean":
-            return int(value)
+    def _snapshot(self, tree):
+        index = np.fromiter(tree.index(), dtype=np.int64, count=len(tree))
+        values = np.array(list(tree.values()), dtype=storage_dtype(self.dtype))
+
+        if self._missing:
+            valid = ~np.isin(index, np.fromiter(self._missing, dtype=np.int64, count=len(self._missing)))
         else:
-            return value
+            valid = np.ones(len(index), dtype=bool)
 
-    def within(self, date) -> bool:
-        if self.empty:
-            return False
+        return index, values, valid
 
-        return self.start <= date <= self.end
+    def _safe_add(self, date, value, valid):
+        if date not in self._tree:
+            self.length += 1
+
+        self._tree[date] = value
+        self._arrays = None
+        self._end = date if self._end is None else max(self._end, date)
+
+        self._mark(date, not valid)
+
+        self._refresh_changes(date)
+        if self.retained:
+            self._evict()
+
+    def _evict(self):
+        # every event is erased at most once, so eviction costs amortized O(1) erases per add
+        evicted = False
+        while self.max_events is not None and self.length > self.max_events:
+            self._erase_first()
+            evicted = True
+
+        if self.retention is not None:
+            cutoff = self._end - self.retention
+            while True:
+                first = self._tree.begin()
+                if self.baseline:
+                    following, _ = self._tree.ceil(first + self.increment)
+                    if following is None or following > cutoff:
+                        break
+                elif first >= cutoff:
+                    break
+                self._erase_first()
+                evicted = True
+
+        if evicted:
+            # the change point in effect moves up to the first event that is left
+            first, value = self._tree.floor(self._tree.begin())
+            if first not in self._change_tree:
+                self._change_tree[first] = value
+
+    def _erase_first(self):
+        first = self._tree.begin()
+        self._tree.erase(first)
+        self._mark(first, False)
+        if first in self._change_tree:
+            self._change_tree.erase(first)
+        self.length -= 1
+
+    def _mark(self, date, missing):
+        if missing:
+            if self._missing is NO_MISSING:
+                self._missing = set()
+            self._missing.add(date)
+        elif self._missing:
+            self._missing.discard(date)
+
+    def _refresh_changes(self, date):
+        step = self.increment
+        following, _ = self._tree.ceil(date + step)
+
+        for key in (date, following):
+            if key is None:
+                continue
+
+            _, value = self._tree.floor(key)
+            previous_key, previous_value = self._tree.floor(key - step)
+            if previous_key is None or not same_value(value, previous_value) or \
+                    (key in self._missing) != (previous_key in self._missing):
+                self._change_tree[key] = value
+            elif key in self._change_tree:
+                self._change_tree.erase(key)
+                if self._tree is self._change_tree:
+                    self._mark(key, False)
+
+        self._change_arrays = None
+
+    def _next_free(self, date):
+        if self._collisions is None:
+            self._collisions = {}
+
+        candidate = self._collisions.get(date, date)
+        while candidate in self._tree:
+            candidate = candidate + self.increment
+
+        self._collisions[date] = candidate
+        return candidate
+
+    def add(self, date, value):
+        date = to_nanosecond(date)
+        value, valid = self.cast_input(value)
+
+        if date in self._tree:
+            if self.on_dublicate == "increment":
+                date = self._next_free(date)
+            elif self.on_dublicate == "first":
+                return
+            elif self.on_dublicate in {"sum", "count"}:
+                value = self._tree.floor(date)[1] + value
+                valid = valid and date not in self._missing
+
+        self._safe_add(date, value, valid)
+
+    def extend(self, index, values):
+        index, values, valid = self._sorted(index, *self.cast_inputs(values))
+        if len(index) and not self.empty and index[0] > self._end:
+            self._append(*self._resolved(index, values, valid))
+            if self.retained:
+                self._evict()
+            return
+
+        stored = self.arrays() if not self.empty else None
+        if stored is not None:
+            index, values, valid = self._merged(stored, index, values, valid)
+        else:
+            index, values, valid = self._resolved(index, values, valid)
+
+        drop = self._expired(index)
+        self._rebuild(index[drop:], values[drop:], valid[drop:])
+
+    def _append(self, index, values, valid):
+        # a batch after the last key only inserts its own nodes, the change points continue from the last event
+        last, previous = self._tree.floor(self._end)
+        changes = change_mask(values, previous, True, valid, last not in self._missing)
+
+        if self.storage != "changes":
+            self._tree.insert_range(list(zip(index.tolist(), values.tolist())))
+        self._change_tree.insert_range(list(zip(index[changes].tolist(), values[changes].tolist())))
+
+        missing = index[~valid] if self.storage != "changes" else index[changes & ~valid]
+        if len(missing):
+            if self._missing is NO_MISSING:
+                self._missing = set()
+            self._missing.update(missing.tolist())
+
+        self._arrays, self._change_arrays = None, None
+        self.length += len(index)
+        self._end = int(index[-1])
+
+    def _rebuild(self, index, values, valid):
+        stored = len(self._tree)
+        changes = change_mask(values, valid=valid)
+
+        self._change_tree = rb.Series(dtype=self._infer_dtype(self.dtype),
+                                      index=index[changes].tolist(),
+                                      values=values[changes].tolist(),
+                                      interpolate="floor")
+        if self.storage == "changes":
+            self._tree = self._change_tree
+            self._missing = set(index[changes & ~valid].tolist()) or NO_MISSING
+        else:
+            self._tree = rb.Series(dtype=self._infer_dtype(self.dtype),
+                                   index=index.tolist(),
+                                   values=values.tolist(),
+                                   interpolate=self.interpolation)
+            self._missing = set(index[~valid].tolist()) or NO_MISSING
+
+        self._arrays, self._change_arrays = None, None
+        self.length += len(index) - stored
+        self._end = int(index[-1])
 
     def floor(self, date):
-        try:
-            return self._tree.floor(date)
-        except:
+        if self.empty:
             return np.NaN, self.default
 
+        return self._bounded(self._tree.floor(to_nanosecond(date)))
+
     def ceil(self, date):
-        try:
-            return self._tree.ceil(date)
-        except:
+        if self.empty:
+            return np.NaN, self.default
+
+        return self._bounded(self._tree.ceil(to_nanosecond(date)))
+
+    def _bounded(self, item):
+        date, value = item
+        if date is None:
             return np.NaN, self.default
 
+        return to_timestamp(date), self._output(date, value)
+
     def on(self, on=True):
         if on:
             self._tree.on_itermode()
@@ -235,19 +372,18 @@ class DateTree:
         if dtype == "string":
             rb_dtype = "str"
         elif dtype == "integer":
-            rb_dtype = "float32"
+            rb_dtype = "int64"
         elif dtype == "floating":
-            rb_dtype = "float32"
+            rb_dtype = "float64"
         elif dtype == "boolean":
             rb_dtype = "uint8"
+        elif dtype == "category":
+            rb_dtype = "int32"
         else:
             rb_dtype = "object"
 
         return rb_dtype
 
-    def __len__(self):
-        return self.length
-
     def __iter__(self):
         if not self.empty:
             self.on(True)
@@ -260,8 +396,9 @@ class DateTree:
     def __next__(self):
         try:
             date = next(self._iter)
-            return date, self.get(date)
+            return to_timestamp(date), self.get(date)
         except StopIteration:
             if not self.empty:
                 self.on(False)
             self._iter = iter([])
+            raise
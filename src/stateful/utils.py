@@ -1,3 +1,5 @@
+import sys
+
 import pandas as pd
 import numpy as np
 
@@ -18,20 +20,36 @@ def dict_of_instance(data, key_type, value_type):
     return False
 
 
+def is_missing(value) -> bool:
+    if value is None or value is pd.NA:
+        return True
+
+    try:
+        return bool(value != value)
+    except (TypeError, ValueError):
+        return False
+
+
+OUTPUT_TYPES = {"integer": int, "floating": float, "boolean": bool}
+OUTPUT_KINDS = {"integer": "iu", "boolean": "b"}
+
+
 def cast_output_numpy(dtype, arr: np.ndarray):
-    if dtype == "integer":
+    if dtype not in OUTPUT_KINDS or arr.dtype.kind in OUTPUT_KINDS[dtype] or pd.isna(arr).any():
+        return arr
+    elif dtype == "integer":
         return arr.astype(int)
-    elif dtype == "boolean":
-        return arr.astype(bool)
     else:
-        return arr
+        return arr.astype(bool)
 
 
 def cast_output(dtype, value):
     from stateful.event.event import Event
-    if isinstance(value, Event) and value.isna():
+    if type(value) is OUTPUT_TYPES.get(dtype):
+        return value
+    elif isinstance(value, Event) and value.isna():
         return np.NaN
-    elif not isinstance(value, Event) and pd.isna(value):
+    elif not isinstance(value, Event) and is_missing(value):
         return np.NaN
     elif isinstance(value, np.ndarray):
         return cast_output_numpy(dtype, value)
@@ -46,3 +64,17 @@ def cast_output(dtype, value):
 def infer_dtype(value):
     from pandas.api.types import infer_dtype as infer
     return infer([value])
+
+
+def shallow_size(instance) -> int:
+    size = sys.getsizeof(instance)
+    if hasattr(instance, "__dict__"):
+        size += sys.getsizeof(instance.__dict__)
+    return size
+
+
+def container_size(container, deep=False) -> int:
+    size = sys.getsizeof(container)
+    if deep:
+        size += sum(sys.getsizeof(item) for item in container)
+    return size
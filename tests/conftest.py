@@ -63,4 +63,13 @@ def stateful_state():
     state = State(primary_key="id", time_key="date", configuration=configuration)
     state.include(df, "id", columns=["amount", "agreement", 'payment', "weird_stream"])
 
-    return state
\ No newline at end of file
+    return state
+
+@pytest.fixture()
+def columnar_state_empty():
+    configuration = {
+        "kind": {"dtype": "string", "backend": "columnar"},
+        "can_make": {"dtype": "string", "backend": "columnar"},
+        "amount": {"dtype": "integer", "interpolation": "linear", "backend": "columnar"}
+    }
+    return State(primary_key="id", time_key="date", configuration=configuration)
@@ -74,3 +74,29 @@ def test_df_inserts(conf_state_empty):
     assert state.space[0][datetime(2020, 12, 23)]["amount"] == 52
 
 
+
+
+def test_epoch_inserts(simple_state_empty):
+    state = simple_state_empty
+    day = pd.Timedelta("1d").value
+    start = pd.to_datetime("2020-12-10", utc=True).value
+
+    state.space[1].add({"date": start, "kind": "elf"})
+    state.space[1].add({"date": start + 2 * day, "kind": "grinch"})
+
+    assert state.space[1].start == pd.to_datetime("2020-12-10", utc=True)
+    assert state.space[1][start - day]["kind"] is np.NaN
+    assert state.space[1][start + day]["kind"] == "elf"
+    assert state.space[1]["2020-12-12"]["kind"] == state.space[1][start + 2 * day]["kind"] == "grinch"
+
+
+def test_sparse_inserts_allocate_no_streams(simple_state_empty):
+    state = simple_state_empty
+    state.add({"id": 1, "date": "2020-12-10", "kind": "elf", "amount": np.NaN})
+    state.add({"id": 2, "date": "2020-12-10", "kind": np.NaN, "amount": 3})
+
+    assert set(state.space[1].controller.streams) == {"kind"}
+    assert set(state.space[2].controller.streams) == {"amount"}
+    assert state.space[1]["2020-12-11"] == {"kind": "elf", "amount": np.NaN}
+    assert not hasattr(state.space[1], "__dict__")
+    assert not hasattr(state.space[1].controller.streams["kind"].tree, "__dict__")
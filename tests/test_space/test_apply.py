@@ -1,3 +1,7 @@
+from datetime import datetime
+
+import pandas as pd
+
 
 def test_apply(numeric_state):
     state = numeric_state
@@ -22,3 +26,14 @@ def test_multi_apply(numeric_state):
     assert int(half_half["2020-12-21"]) == -37
     assert half_half["2020-12-22"] == 75
     assert half_half["2020-12-24"] == 150
+
+
+def test_event_date_is_a_timestamp(numeric_state):
+    space = numeric_state.space[0]
+    space["day"] = space["amount"].apply(lambda event: event.date.day)
+
+    expected = pd.Timestamp("2020-12-22", tz="UTC")
+    for item in ["2020-12-22", datetime(2020, 12, 22), expected.value, expected.tz_convert("Europe/Berlin")]:
+        event = space[item]
+        assert event.date == expected and event.date.tz is not None
+        assert event["day"] == 22
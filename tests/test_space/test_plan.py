@@ -0,0 +1,36 @@
+from stateful.storage.stream_graph import StreamGraph
+
+
+def test_plan_is_cached_until_the_graph_changes():
+    graph = StreamGraph({"a", "b"})
+    plan = graph.plan()
+    assert graph.plan() is plan
+
+    graph.add("a", [])
+    assert graph.plan() is plan
+
+    graph.add("c", ["a", "b"])
+    graph.add("d", ["c"])
+    assert graph.plan() is not plan
+    assert [name for name, _ in graph.plan()][-2:] == ["c", "d"]
+    assert dict(graph.plan())["c"] == ["a", "b"]
+
+
+def test_plan_of_columns_holds_their_dependencies_only():
+    graph = StreamGraph({"a", "b", "e"})
+    graph.add("c", ["a"])
+    graph.add("d", ["c", "b"])
+
+    assert [name for name, _ in graph.plan(["c"])] == ["a", "c"]
+    assert sorted(name for name, _ in graph.plan(["d"])) == ["a", "b", "c", "d"]
+    assert graph.plan(["d"])[-1] == ("d", ["c", "b"])
+
+
+def test_controller_steps_follow_new_streams(numeric_state):
+    space = numeric_state.space[0]
+    steps = space.controller.steps()
+    assert space.controller.steps() is steps
+
+    space["half"] = space["amount"].apply(lambda a: a / 2)
+    assert space.controller.steps() is not steps
+    assert space["2020-12-20"]["half"] == -50
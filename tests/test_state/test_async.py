@@ -0,0 +1,80 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from stateful import State
+
+START = pd.Timestamp("2020-01-01", tz="UTC")
+GRID = pd.date_range("2020-01-01", "2020-01-10", freq="6h", tz="UTC")
+
+
+def events(count):
+    for i in range(count):
+        event = {"id": i % 7, "date": START + pd.Timedelta(i, unit="h"), "amount": i}
+        if i % 5 == 0:
+            event["status"] = None if i % 10 == 0 else f"s{i % 3}"
+        yield event
+
+
+def assert_same(expected, actual):
+    assert len(actual) == len(expected)
+    for key, space in expected.all_spaces.items():
+        assert set(actual.space[key].controller.streams) == set(space.controller.streams)
+        for name, column in space.all(GRID).items():
+            assert list(actual.space[key].all(GRID)[name].events.astype(str)) == list(column.events.astype(str))
+
+
+def added(count):
+    state = State("id")
+    for event in events(count):
+        state.add(event)
+    return state
+
+
+def test_add_many_matches_add():
+    state = State("id")
+    state.add_many(list(events(200)))
+
+    assert_same(added(200), state)
+
+
+def test_aadd_batches_with_backpressure():
+    state = State("id").batching(batch_size=16, latency=0.001, max_pending=8)
+    batches, pending = [], []
+    add_many = state.add_many
+
+    def recorded(batch):
+        batches.append(len(batch))
+        pending.append(state.batcher._queue.qsize())
+        add_many(batch)
+
+    state.add_many = recorded
+
+    async def produce():
+        for event in events(100):
+            await state.aadd(event)
+        await state.aadd_many(events(200))
+        await state.aflush()
+
+    asyncio.run(produce())
+
+    assert sum(batches) == 300
+    assert max(batches) == 16
+    assert max(pending) <= 8
+    assert len(state) == 300
+
+
+def test_aflush_reads_own_writes_and_raises(tmp_path):
+    state = State("id").durable(tmp_path, group=1024)
+
+    async def produce():
+        await state.aadd_many(events(50))
+        await state.aflush()
+        assert len(state) == 50
+
+        await state.aadd({"id": 1, "amount": 1})
+        with pytest.raises(AssertionError):
+            await state.aflush()
+
+    asyncio.run(produce())
+    assert_same(added(50), State.recover(tmp_path))
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+from stateful.storage.dedup import HashIndex, event_hash, event_hashes
+
+START = pd.Timestamp("2020-01-01", tz="UTC")
+GRID = pd.date_range(START, periods=12, freq="1h")
+
+
+def frame(start, stop):
+    return pd.DataFrame({
+        "id": [i % 3 for i in range(start, stop)],
+        "date": [START + pd.Timedelta(i, unit="h") for i in range(start, stop)],
+        "amount": list(range(start, stop)),
+        "status": [f"s{i % 2}" for i in range(start, stop)]
+    })
+
+
+def snapshot(state):
+    return {(key, name): list(column.events.astype(str)) for key in sorted(state.all_spaces)
+            for name, column in state.space[key].all(GRID).items()}
+
+
+def test_bulk_hashes_match_single_hashes():
+    dates = np.arange(6, dtype=np.int64) * 10 ** 9
+    for values in ([1, 1.0, True, 2.5, None, "x"], np.array([1, 2, 3, 4, 5, 6]), np.array([0.5, 1, np.nan, 2, 3, 4])):
+        expected = [event_hash("amount", date, value) for date, value in zip(dates.tolist(), values)]
+        assert event_hashes("amount", dates, values).tolist() == expected
+
+    assert event_hash("amount", 0, 1) == event_hash("amount", 0, 1.0) == event_hash("amount", 0, True)
+    assert event_hash("amount", 0, 1) != event_hash("amount", 0, "1")
+
+
+def test_hash_index():
+    index = HashIndex()
+    assert index.add(5) and not index.add(5)
+    assert list(index.add_many(np.array([5, 7, 7, 9], dtype=np.uint64))) == [False, True, False, True]
+    assert len(index) == 3
+    assert list(index.hashes()) == [5, 7, 9]
+
+
+@pytest.mark.parametrize("bulk", [True, False])
+def test_redelivery_keeps_state(bulk):
+    state, plain = State("id", idempotent=True), State("id")
+    df = frame(0, 10)
+    for target in (state, plain):
+        for _ in range(3):
+            if bulk:
+                target.include(df, columns=["amount", "status"])
+            else:
+                for event in df.to_dict("records"):
+                    target.add(event)
+
+    assert len(state) == 10
+    assert len(plain) == 30
+    assert sum(len(space.controller["amount"]) for space in state.all_spaces.values()) == 10
+    once = State("id")
+    once.include(df, columns=["amount", "status"])
+    assert snapshot(state) == snapshot(once)
+
+
+def test_partial_duplicate_keeps_new_values():
+    state = State("id", idempotent=True)
+    state.add({"id": 0, "date": START, "amount": 1, "status": "open"})
+    state.add({"id": 0, "date": START, "amount": 1, "status": "closed"})
+    state.include(pd.DataFrame({"id": [0, 0], "date": [START, START + pd.Timedelta(1, unit="h")],
+                                "amount": [1, 2]}), columns=["amount"])
+
+    assert len(state) == 3
+    assert len(state.space[0].controller["amount"]) == 2
+    assert len(state.space[0].controller["status"]) == 2
+    assert state.memory_usage().loc["(space)", "index"] > 0
+
+
+def test_index_survives_save_and_recover(tmp_path):
+    state = State("id", idempotent=True)
+    state.include(frame(0, 10), columns=["amount", "status"])
+    state.save(tmp_path / "saved")
+
+    opened = State.open(tmp_path / "saved")
+    opened.include(frame(5, 12), columns=["amount", "status"])
+    assert len(opened) == 12
+
+    durable = State("id", idempotent=True).durable(tmp_path / "log", group=4, checkpoint_every=8)
+    for event in frame(0, 10).to_dict("records"):
+        durable.add(event)
+    durable.flush()
+
+    recovered = State.recover(tmp_path / "log")
+    recovered.include(frame(0, 12), columns=["amount", "status"])
+    assert len(recovered) == 12
+    assert snapshot(recovered) == snapshot(opened)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+
+GRID = pd.date_range("2020-01-01", "2020-01-12", freq="6h", tz="UTC")
+
+
+def frame(rows=300, seed=1):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "id": rng.integers(20, size=rows),
+        "date": pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rng.integers(240, size=rows), unit="h"),
+        "amount": rng.integers(100, size=rows).astype(float),
+        "status": rng.choice(["open", "closed"], size=rows).astype(object)
+    })
+    df.loc[rng.random(rows) < 0.2, "amount"] = np.NaN
+    df.loc[rng.random(rows) < 0.2, "status"] = None
+    df.loc[df.index[:5], "date"] = pd.NaT
+    return df
+
+
+def added(df, **arguments):
+    state = State("id")
+    for row in df.to_dict(orient="records"):
+        if pd.isna(row["date"]):
+            if arguments.get("drop_na"):
+                continue
+            row["date"] = arguments["fill_na"]
+        state.add(row)
+    return state
+
+
+def assert_same(expected, actual):
+    assert len(actual) == len(expected)
+    assert set(actual.all_spaces) == set(expected.all_spaces)
+    for key, space in expected.all_spaces.items():
+        assert set(actual.space[key].controller.streams) == set(space.controller.streams)
+        for name, column in space.all(GRID).items():
+            assert values(actual.space[key].all(GRID)[name]) == values(column), (key, name)
+
+
+def values(column):
+    return ["nan" if pd.isna(value) else str(value) for value in column.events]
+
+
+@pytest.mark.parametrize("arguments", [{"drop_na": True}, {"fill_na": "2020-01-05"}])
+def test_include_matches_add(arguments):
+    df = frame()
+    state = State("id")
+    state.include(df, columns=["amount", "status"], **arguments)
+
+    assert_same(added(df, **arguments), state)
+
+
+def test_include_event_and_log(tmp_path):
+    df = frame().dropna(subset=["date"])
+    state = State("id").durable(tmp_path, group=64)
+    state.include(df, columns={"amount": "value"}, event={"source": "batch"})
+    state.flush()
+
+    assert state.space[int(df["id"].iloc[0])]["2020-01-12"]["source"] == "batch"
+    assert_same(state, State.recover(tmp_path))
+
+
+def test_parallel_include_matches():
+    df = frame(rows=2000).dropna(subset=["date"])
+    existing = {"id": 3, "date": "2019-12-31", "status": "pending", "amount": 1.0}
+
+    expected, state = State("id"), State("id", configuration={"status": {"dtype": "category"}})
+    for target in (expected, state):
+        target.add(dict(existing))
+    expected.include(df, columns=["amount", "status"])
+    state.include(df, columns=["amount", "status"], workers=3)
+
+    assert_same(expected, state)
+    assert state.dictionaries["status"].categories[0] == "pending"
+
+
+def test_include_stream_of_chunks():
+    df = frame(rows=1000).dropna(subset=["date"])
+    chunks = [df.iloc[:400], df.iloc[400:400], df.iloc[400:700].to_dict(orient="list"),
+              df.iloc[700:].to_dict(orient="records")]
+
+    progress = []
+    state = State("id")
+    assert state.include_stream(iter(chunks), callback=progress.append, columns=["amount", "status"]) == len(df)
+
+    assert_same(added(df, drop_na=True), state)
+    assert [report["rows"] for report in progress] == [400, 0, 300, len(df) - 700]
+    assert progress[-1]["total"] == len(df)
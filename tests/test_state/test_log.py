@@ -0,0 +1,89 @@
+import os
+import time
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+
+START = pd.Timestamp("2020-01-01", tz="UTC")
+
+
+def fill(state, start, stop):
+    for i in range(start, stop):
+        state.add({"id": i % 3, "date": START + pd.Timedelta(i, unit="h"), "amount": i, "status": f"s{i % 2}"})
+
+
+def test_recover_from_log(tmp_path):
+    state = State("id").durable(tmp_path, group=8)
+    fill(state, 0, 20)
+    state.flush()
+
+    recovered = State.recover(tmp_path)
+    assert len(recovered) == 20
+    for id in range(3):
+        assert recovered.space[id]["2020-01-01 12:30"] == state.space[id]["2020-01-01 12:30"]
+
+
+def test_recover_replays_tail_after_checkpoint(tmp_path):
+    state = State("id").durable(tmp_path, group=4, checkpoint_every=10)
+    fill(state, 0, 25)
+    state.flush()
+
+    assert os.path.exists(tmp_path / "checkpoint")
+    assert [name for name in os.listdir(tmp_path) if name.startswith("log-")] == ["log-2.jsonl"]
+
+    with open(tmp_path / "log-2.jsonl", "ab") as file:
+        file.write(b'[0, 17')
+
+    recovered = State.recover(tmp_path)
+    assert len(recovered) == 25
+    assert recovered.space[1]["2020-01-02"]["amount"] == 22
+
+    fill(recovered, 25, 30)
+    recovered.flush()
+    assert len(State.recover(tmp_path)) == 30
+
+
+def test_recover_keeps_key_and_value_types(tmp_path):
+    keys = [pd.Timestamp("2020-01-01", tz="UTC"), ("a", Decimal("1.5"))]
+    state = State("id").durable(tmp_path, group=2, checkpoint_every=3)
+    for i in range(4):
+        state.add({"id": keys[i % 2], "date": START + pd.Timedelta(i, unit="h"), "amount": Decimal(i),
+                   "due": START + pd.Timedelta(i, unit="d")})
+    state.space[keys[0]].extend([START + pd.Timedelta(5, unit="h")], {"due": np.array([START.asm8])})
+    state.flush()
+
+    recovered = State.recover(tmp_path)
+    assert set(recovered.all_spaces) == set(keys)
+    assert recovered.space[keys[1]]["2020-01-01 03:00"]["amount"] == Decimal(3)
+    assert recovered.space[keys[0]]["2020-01-01 02:00"]["due"] == START + pd.Timedelta(2, unit="d")
+    assert pd.Timestamp(recovered.space[keys[0]]["2020-01-01 05:00"]["due"]) == START.tz_localize(None)
+
+    with pytest.raises(TypeError):
+        state.add({"id": object(), "date": START, "amount": 1})
+
+
+def test_rejected_event_is_not_applied(tmp_path):
+    state = State("id").durable(tmp_path, group=1)
+    fill(state, 0, 3)
+
+    with pytest.raises(TypeError):
+        state.add({"id": 1, "date": START + pd.Timedelta(1, unit="d"), "amount": object()})
+    with pytest.raises(TypeError):
+        state.space[1].extend([START + pd.Timedelta(1, unit="d")], {"amount": [object()]})
+
+    assert len(state) == 3
+    assert state.space[1]["2020-01-02"]["amount"] == 1
+    assert len(State.recover(tmp_path)) == 3
+
+
+def test_idle_log_is_written_without_flush(tmp_path):
+    state = State("id").durable(tmp_path, group=256, sync_interval=0.05)
+    fill(state, 0, 3)
+    time.sleep(0.5)
+
+    recovered = State.recover(tmp_path)
+    assert len(recovered) == 3
+    assert recovered.space[2]["2020-01-01 02:00"]["amount"] == 2
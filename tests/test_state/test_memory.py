@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+from stateful import State
+from stateful.storage.stream import Stream
+
+DATES = pd.date_range("2020-01-01", periods=100, freq="1h", tz="UTC")
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_stream_memory_usage(backend):
+    events = Stream("amount", configuration={"backend": backend, "dtype": "integer"})
+    changes = Stream("amount", configuration={"backend": backend, "dtype": "integer", "storage": "changes"})
+    for stream in (events, changes):
+        stream.extend(DATES, [i // 10 for i in range(100)])
+
+    usage, compact = events.memory_usage(), changes.memory_usage()
+    assert usage["events"] >= 100 * 16
+    assert usage["changes"] >= 10 * 16
+    assert compact["events"] == 0
+    assert compact["changes"] == usage["changes"]
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_deep_memory_usage_counts_objects(backend):
+    stream = Stream("name", configuration={"backend": backend, "dtype": "string"})
+    stream.extend(DATES, [f"name-{i}" for i in range(100)])
+
+    assert stream.memory_usage(deep=True)["events"] > stream.memory_usage(deep=False)["events"]
+
+
+def test_state_memory_usage():
+    state = State("id", configuration={"status": {"dtype": "category"}})
+    for id in range(4):
+        for date in DATES[:10]:
+            state.add({"id": id, "date": date, "amount": id, "status": "open"})
+    state.space[4].add_stream("amount")
+
+    usage = state.memory_usage()
+    assert list(usage.index) == ["amount", "status", "(space)"]
+    assert list(usage["length"]) == [40, 40, 0]
+    assert list(usage["streams"]) == [5, 4, 5]
+    assert list(usage["empty"]) == [1, 0, 1]
+    assert usage.loc["status", "dictionary"] > 0
+    assert usage.loc["amount", "bytes_per_event"] == usage.loc["amount", "total"] / 40
+    assert (usage["total"] == usage.drop(columns=["total", "length", "streams", "empty", "bytes_per_event"])
+            .sum(axis=1)).all()
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+from stateful.storage.pool import PooledArray
+
+DATES = pd.date_range("2020-01-01", periods=20, freq="1d", tz="UTC")
+GRID = pd.date_range("2019-12-31", "2020-01-22", freq="12h", tz="UTC")
+
+
+def configuration():
+    return {"status": {"dtype": "category"}, "level": {"interpolation": "linear"}, "amount": {"max_events": 15}}
+
+
+def fill(state):
+    for id in range(5):
+        for position, date in enumerate(DATES[::-1] if id % 2 else DATES):
+            state.add({"id": id,
+                       "date": date,
+                       "amount": np.NaN if position == 3 else float(position * id),
+                       "level": float(position),
+                       "status": f"s{position % 3}"})
+    state.add({"id": 0, "date": DATES[4] + pd.Timedelta(1, unit="h"), "amount": 100.0})
+    return state
+
+
+def test_pooled_state_matches():
+    pooled = fill(State("id", configuration=configuration(), pool_timestamps=True))
+    plain = fill(State("id", configuration=configuration()))
+
+    for expected, actual in zip(plain.all(list(GRID)), pooled.all(list(GRID))):
+        for name in ["amount", "status"]:
+            assert list(actual[name].events.astype(str)) == list(expected[name].events.astype(str))
+        assert np.allclose(actual["level"].events, expected["level"].events)
+
+    assert len(pooled.timestamps) == len(DATES) + 1
+    assert pooled.space[0].controller["amount"].tree._index.ids.dtype == np.int32
+
+
+def test_pool_resolves_grid_once():
+    state = fill(State("id", pool_timestamps=True))
+    resolved = state.timestamps.resolve(GRID)
+
+    assert state.timestamps.resolve(GRID) is resolved
+    assert state.space[3]["2020-01-05 03:00"]["amount"] == 3.0 * 15
+    assert state.memory_usage().loc["amount", "events"] < 5 * 21 * 16
+
+
+def test_pooled_point_reads_search_ranks(monkeypatch):
+    pooled = fill(State("id", configuration=configuration(), pool_timestamps=True))
+    plain = fill(State("id", configuration=configuration()))
+    trees = [(pooled.space[id].controller["amount"].tree, plain.space[id].controller["amount"].tree) for id in range(5)]
+
+    for actual, _ in trees:
+        assert not actual.empty and actual.length
+
+    # point reads never look up the whole index of a pooled stream
+    monkeypatch.setattr(PooledArray, "data", property(lambda _: pytest.fail("the pooled index was looked up")))
+    for date in GRID:
+        for actual, expected in trees:
+            assert str(actual.get(date)) == str(expected.get(date))
+            assert str(actual.floor(date)) == str(expected.floor(date))
+            assert str(actual.ceil(date)) == str(expected.ceil(date))
+
+    index = trees[0][0]._index
+    assert index.ranks() is index.ranks()
+    monkeypatch.undo()
+    pooled.space[0].add({"date": DATES[-1] + pd.Timedelta(1, unit="d"), "amount": 1.0})
+    assert pooled.space[0]["2020-01-22"]["amount"] == 1.0
+
+
+def test_reopened_and_included_states_stay_pooled(tmp_path):
+    plain = fill(State("id", configuration=configuration()))
+    fill(State("id", configuration=configuration(), pool_timestamps=True)).save(tmp_path / "saved")
+    opened = State.open(tmp_path / "saved")
+    frame = pd.DataFrame([{"id": id, "date": date, "amount": float(id), "level": float(position), "status": f"s{id}"}
+                          for id in range(5) for position, date in enumerate(DATES)])
+    expected = State("id", configuration=configuration())
+    expected.include(frame, columns=["amount", "level", "status"])
+
+    included = State("id", configuration=configuration(), pool_timestamps=True)
+    included.include(frame, columns=["amount", "level", "status"], workers=2)
+
+    for state, reference in ((opened, plain), (included, expected)):
+        assert len(state.timestamps) == len(DATES)
+        for id in range(5):
+            assert isinstance(state.space[id].controller["amount"].tree._index, PooledArray)
+
+            actual, expected_space = state.space[id].all(GRID), reference.space[id].all(GRID)
+            for name in ["amount", "status"]:
+                assert list(actual[name].events.astype(str)) == list(expected_space[name].events.astype(str))
+            assert np.allclose(actual["level"].events, expected_space["level"].events)
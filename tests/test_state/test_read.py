@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+
+GRID = pd.date_range("2020-01-01", "2020-01-12", freq="6h", tz="UTC")
+
+
+def frame(rows=500, seed=2):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer": rng.integers(10, size=rows),
+        "timestamp": pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rng.integers(240, size=rows), unit="h"),
+        "amount": rng.integers(100, size=rows).astype(float),
+        "status": rng.choice(["open", "closed"], size=rows),
+        "comment": rng.choice(["a", "b"], size=rows)
+    })
+
+
+def assert_same(expected, actual):
+    assert len(actual) == len(expected)
+    assert actual.keys == expected.keys == {"amount", "state"}
+    for key, space in expected.all_spaces.items():
+        for name, column in space.all(GRID).items():
+            assert list(actual.space[key].all(GRID)[name].events.astype(str)) == list(column.events.astype(str))
+
+
+def included(df):
+    state = State("id")
+    state.include(df, primary_column="customer", time_column="timestamp",
+                  columns={"amount": "amount", "status": "state"})
+    return state
+
+
+def test_read_csv_in_blocks(tmp_path):
+    df = frame()
+    df.to_csv(tmp_path / "events.csv", index=False)
+
+    progress = []
+    state = State("id")
+    rows = state.read_csv(tmp_path / "events.csv", primary_column="customer", time_column="timestamp",
+                          columns={"amount": "amount", "status": "state"}, chunksize=64, callback=progress.append)
+
+    assert rows == len(df)
+    assert len(progress) == 8
+    assert_same(included(df), state)
+
+
+def test_read_parquet_in_blocks(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = frame()
+    df.to_parquet(tmp_path / "events.parquet", index=False)
+
+    state = State("id")
+    state.read_parquet(tmp_path / "events.parquet", primary_column="customer", time_column="timestamp",
+                       columns={"amount": "amount", "status": "state"}, chunksize=64)
+
+    assert_same(included(df), state)
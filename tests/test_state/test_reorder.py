@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from stateful import State
+
+START = pd.Timestamp("2020-01-01", tz="UTC")
+GRID = pd.date_range("2020-01-01", "2020-01-03", freq="30min", tz="UTC")
+CONFIGURATION = {"status": {"storage": "changes"}}
+
+
+def jittered(count=300, seed=3):
+    # statuses that repeat, arriving up to 90 minutes late
+    rng = np.random.default_rng(seed)
+    dates = START + pd.to_timedelta(np.arange(count) * 10 + rng.integers(90, size=count), unit="min")
+    statuses = rng.choice(["open", "closed"], size=count, p=[0.8, 0.2])
+    return [{"id": i % 3, "date": date, "status": status} for i, (date, status) in enumerate(zip(dates, statuses))]
+
+
+def columns(state):
+    return {key: list(space.all(GRID)["status"].events) for key, space in state.all_spaces.items()}
+
+
+def in_order(events):
+    state = State("id", configuration=CONFIGURATION)
+    for event in sorted(events, key=lambda event: event["date"]):
+        state.add(dict(event))
+    return state
+
+
+def test_reorder_window_sorts_late_events():
+    events = jittered()
+    state = State("id", configuration=CONFIGURATION, reorder_window="2h")
+    for event in events:
+        state.add(dict(event))
+
+    assert len(state) == len(events)
+    assert columns(state) == columns(in_order(events))
+
+
+def test_events_behind_the_window_are_backfilled():
+    state = State("id", reorder_window="1h")
+    for hour in [0, 5, 6, 2, 7, 6]:
+        state.add({"id": 1, "date": START + pd.Timedelta(hour, unit="h"), "amount": hour})
+
+    space = state.all_spaces[1]
+    hours = [(START + pd.Timedelta(hour, unit="h")).value for hour in [6, 6, 7]]
+    assert sorted(date for date, _, _ in space._pending) == hours
+
+    amounts = space.controller["amount"]
+    assert not space._pending
+    assert amounts.values() == [0, 2, 5, 6, 6, 7]
+    assert amounts.dates()[3:5] == [START + pd.Timedelta(6, unit="h"), START + pd.Timedelta(21600000000001)]
+
+
+def test_reorder_window_is_recovered(tmp_path):
+    events = jittered(60)
+    state = State("id", configuration=CONFIGURATION, reorder_window="2h").durable(tmp_path, group=8)
+    for event in events:
+        state.add(dict(event))
+    state.flush()
+
+    recovered = State.recover(tmp_path)
+    assert recovered.reorder_window == pd.Timedelta("2h").value
+    assert columns(recovered) == columns(in_order(events))
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+
+GRID = pd.date_range("2020-01-01", "2020-01-05", freq="12h", tz="UTC")
+COLUMNS = ["agreement", "amount", "name", "flag"]
+
+
+def example_state():
+    configuration = {
+        "agreement": {"dtype": "category"},
+        "flag": {"dtype": "boolean", "storage": "changes"}
+    }
+    state = State("id", configuration=configuration)
+    for id in range(3):
+        state.add({"id": id, "date": "2020-01-01", "agreement": "started", "amount": 2 ** 60 + id, "name": "x",
+                   "flag": True})
+        state.add({"id": id, "date": "2020-01-03", "agreement": "ended", "amount": np.NaN, "name": "y",
+                   "flag": True})
+    return state
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_open(tmp_path, mmap):
+    state = example_state()
+    state.save(tmp_path)
+
+    opened = State.open(tmp_path, mmap=mmap)
+    assert opened.keys == set(COLUMNS)
+    assert len(opened) == len(state) == 6
+
+    for id in range(3):
+        expected, actual = state.space[id].all(GRID), opened.space[id].all(GRID)
+        for name in COLUMNS:
+            assert list(actual[name].events.astype(str)) == list(expected[name].events.astype(str))
+
+    assert opened.space[1]["2020-01-02"]["amount"] == 2 ** 60 + 1
+    assert len(opened.space[1].controller["flag"]) == 2
+
+
+def test_reopened_streams_copy_on_write(tmp_path):
+    example_state().save(tmp_path)
+
+    opened = State.open(tmp_path)
+    opened.space[0].add({"date": "2020-01-02", "amount": 5})
+    opened.space[0].add({"date": "2020-01-04", "amount": 7})
+    assert opened.space[0]["2020-01-02 12:00"]["amount"] == 5
+
+    again = State.open(tmp_path)
+    assert again.space[0]["2020-01-02 12:00"]["amount"] == 2 ** 60
+    assert len(again.space[0].controller["amount"]) == 2
+
+
+def test_object_columns_are_not_pickled(tmp_path):
+    state = State("id", configuration={"payload": {"dtype": "mixed"}})
+    for id in range(3):
+        state.add({"id": id, "date": "2020-01-01", "name": f"n{id}", "payload": 1})
+        state.add({"id": id, "date": "2020-01-02", "name": None, "payload": True})
+        state.add({"id": id, "date": "2020-01-03", "name": "n", "payload": pd.Timestamp("2020-01-01", tz="UTC")})
+    state.save(tmp_path)
+
+    for path in tmp_path.glob("*/*.npy"):
+        assert np.load(path, mmap_mode="r").dtype != object
+
+    opened = State.open(tmp_path)
+    tree = opened.space[1].controller["name"].tree
+    assert type(tree._values).__name__ == "CodedArray"
+    assert [opened.space[1][date]["name"] for date in ["2020-01-01", "2020-01-03"]] == ["n1", "n"]
+    assert [opened.space[1][date]["payload"] for date in ["2020-01-01", "2020-01-02", "2020-01-03"]] == \
+        [1, True, pd.Timestamp("2020-01-01", tz="UTC")]
+
+    opened.space[1].add({"date": "2020-01-04", "name": "m"})
+    assert opened.space[1]["2020-01-04"]["name"] == "m"
+    assert opened.space[1]["2020-01-01"]["name"] == "n1"
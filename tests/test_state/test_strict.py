@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+
+GRID = pd.date_range("2020-01-01", "2020-01-12", freq="6h", tz="UTC")
+SCHEMA = {
+    "amount": {"dtype": "floating"},
+    "count": {"dtype": "integer"},
+    "status": {"dtype": "category"},
+    "open": {"dtype": "boolean"}
+}
+
+
+def frame(rows=300, seed=4):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "id": rng.integers(10, size=rows),
+        "date": pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(rng.integers(240, size=rows), unit="h"),
+        "amount": rng.integers(100, size=rows).astype(float),
+        "count": rng.integers(5, size=rows),
+        "status": rng.choice(["open", "closed"], size=rows).astype(object),
+        "open": rng.random(rows) < 0.5
+    })
+    df.loc[rng.random(rows) < 0.2, "amount"] = np.NaN
+    df.loc[rng.random(rows) < 0.2, "status"] = None
+    return df
+
+
+def test_strict_include_matches_inferred():
+    df = frame()
+    strict, inferred = State("id", configuration=SCHEMA, strict=True), State("id", configuration=SCHEMA)
+    strict.include(df, columns=list(SCHEMA))
+    for row in df.to_dict(orient="records"):
+        inferred.add(row)
+
+    assert len(strict) == len(inferred)
+    for key, space in inferred.all_spaces.items():
+        for name, column in space.all(GRID).items():
+            actual = strict.space[key].all(GRID)[name]
+            assert actual.dtype == column.dtype == SCHEMA[name]["dtype"]
+            assert list(actual.events.astype(str)) == list(column.events.astype(str)), (key, name)
+
+
+def test_strict_schema_is_enforced():
+    with pytest.raises(AssertionError):
+        State("id", configuration={"amount": {"storage": "changes"}}, strict=True)
+
+    state = State("id", configuration=SCHEMA, strict=True)
+    with pytest.raises(AssertionError):
+        state.add({"id": 1, "date": "2020-01-01", "other": 1})
+
+    df = frame(20)
+    for column, value in [("count", 1.5), ("count", "x"), ("amount", "1.5"), ("status", 3), ("open", "yes")]:
+        broken = df.astype(object)
+        broken.loc[3, column] = value
+        with pytest.raises(AssertionError):
+            state.include(broken, columns=list(SCHEMA))
+
+    for column, value in [("count", 1.5), ("count", "x"), ("amount", "1.5"), ("status", 3), ("open", "yes")]:
+        with pytest.raises(AssertionError):
+            state.add({"id": 1, "date": "2020-01-01", column: value})
+
+    assert len(state) == 0
+    state.add({"id": 1, "date": "2020-01-01", "count": 2.0, "amount": 1, "status": None, "open": np.True_})
+    assert state.space[1]["2020-01-01"] == {"count": 2, "amount": 1.0, "status": np.NaN, "open": True}
+    assert type(state.space[1].controller["count"].tree.get("2020-01-01")) is int
+
+
+def test_strict_parallel_include():
+    df = frame()
+    parallel, serial = State("id", configuration=SCHEMA, strict=True), State("id", configuration=SCHEMA, strict=True)
+    parallel.include(df, columns=list(SCHEMA), workers=2)
+    serial.include(df, columns=list(SCHEMA))
+
+    for key, space in serial.all_spaces.items():
+        for name, column in space.all(GRID).items():
+            assert list(parallel.space[key].all(GRID)[name].events.astype(str)) == list(column.events.astype(str))
+
+    state = State("id", configuration=SCHEMA, strict=True)
+    broken = df.astype(object)
+    broken.loc[3, "count"] = 1.5
+    with pytest.raises(AssertionError):
+        state.include(broken, columns=list(SCHEMA), workers=2)
+    with pytest.raises(AssertionError):
+        state.include(df.assign(bogus=1), columns=list(SCHEMA) + ["bogus"], workers=2)
+
+    assert len(state) == 0
+
+
+def test_strict_flag_is_saved(tmp_path):
+    state = State("id", configuration=SCHEMA, strict=True)
+    state.include(frame(50), columns=list(SCHEMA))
+    state.save(tmp_path)
+
+    assert State.open(tmp_path).strict
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful.storage.columnar import ColumnarTree
+from stateful.storage.stream import Stream
+from stateful.storage.tree import DateTree
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_extend_matches_add(backend):
+    dates = ["2020-01-01", "2020-01-04", "2020-01-02", "2020-01-03", "2020-01-06"]
+    values = [np.NaN, 4, 2, 2, 6]
+
+    bulk = Stream("amount", configuration={"backend": backend})
+    bulk.extend(dates, values)
+
+    single = Stream("amount", configuration={"backend": backend})
+    for date, value in zip(dates, values):
+        single.add(date, value)
+
+    assert bulk.dtype == single.dtype == "integer"
+    assert len(bulk) == len(single) == 4
+    assert bulk.dates() == single.dates()
+
+    grid = pd.date_range("2019-12-31", "2020-01-07", freq="1d", tz="UTC")
+    assert list(bulk.all(grid).events) == list(single.all(grid).events) == [0, 0, 2, 2, 4, 4, 6, 6]
+
+
+@pytest.mark.parametrize("tree_type", [DateTree, ColumnarTree])
+def test_from_arrays(tree_type):
+    index = pd.to_datetime(["2020-01-03", "2020-01-01", "2020-01-02", "2020-01-05"], utc=True)
+    tree = tree_type.from_arrays(index, ["ended", "started", "started", "ended"], name="status")
+
+    assert tree.dtype == "string"
+    assert len(tree) == 4
+    assert tree.start == pd.to_datetime("2020-01-01", utc=True)
+    assert tree.get("2020-01-04") == "ended"
+
+    tree.extend(pd.to_datetime(["2020-01-06", "2019-12-31"], utc=True), ["started", "started"])
+    assert len(tree) == 6
+    assert tree.first == "started"
+    assert tree.get("2020-01-07") == "started"
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("storage", ["events", "changes"])
+def test_extend_after_end_matches_add(backend, storage):
+    dates = pd.date_range("2020-01-01", periods=8, freq="1d", tz="UTC")
+    values = ["a", "a", None, None, "b", "b", None, "a"]
+    configuration = {"backend": backend, "storage": storage}
+
+    bulk = Stream("status", configuration=dict(configuration))
+    for start in range(0, len(dates), 3):
+        bulk.extend(dates[start:start + 3], values[start:start + 3])
+
+    single = Stream("status", configuration=dict(configuration))
+    for date, value in zip(dates, values):
+        single.add(date, value)
+
+    grid = pd.date_range("2019-12-31", "2020-01-09", freq="12h", tz="UTC")
+    assert len(bulk) == len(single)
+    assert [str(value) for value in bulk.all(grid).events] == [str(value) for value in single.all(grid).events]
+    assert [str(bulk.get(date)) for date in grid] == [str(single.get(date)) for date in grid]
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+from stateful.storage.dictionary import Dictionary
+from stateful.storage.stream import Stream
+
+GRID = pd.date_range("2020-01-01", "2020-01-04", freq="1d", tz="UTC")
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_category_streams_share_a_dictionary(backend):
+    state = State("id", configuration={"agreement": {"dtype": "category", "backend": backend}})
+    for id in range(3):
+        state.add({"id": id, "date": "2020-01-01", "agreement": "started"})
+        state.add({"id": id, "date": "2020-01-03", "agreement": "ended"})
+
+    space = state.space[1]
+    assert space["2020-01-02"]["agreement"] == "started"
+
+    events = space.all(GRID)["agreement"].events
+    assert isinstance(events, pd.Categorical)
+    assert list(events.codes) == [0, 0, 1, 1]
+    assert state.dictionaries["agreement"].categories == ["started", "ended"]
+
+    space["is_started"] = space["agreement"] == "started"
+    assert list(space.all(GRID)["is_started"].events) == [True, True, False, False]
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_category_missing_values(backend):
+    stream = Stream("status", configuration={"backend": backend, "dtype": "category"}, dictionary=Dictionary())
+    stream.extend(["2020-01-01", "2020-01-02", "2020-01-03"], ["visa", np.NaN, "cool"])
+
+    assert stream.get("2020-01-02") is np.NaN
+    assert stream.get("2020-01-03") == "cool"
+    assert list(stream.all(GRID).events.codes) == [0, -1, 1, 1]
+
+
+def test_low_cardinality_batches_are_encoded():
+    dictionary = Dictionary()
+
+    stream = Stream("status", configuration={}, dictionary=dictionary)
+    stream.extend(pd.date_range("2020-01-01", periods=6, tz="UTC"), ["a", "b", "a", "a", "b", "a"])
+    assert stream.dtype == "category"
+
+    unique = Stream("name", configuration={}, dictionary=Dictionary())
+    unique.extend(pd.date_range("2020-01-01", periods=3, tz="UTC"), ["a", "b", "c"])
+    assert unique.dtype == "string"
+
+    follower = Stream("status", configuration={}, dictionary=dictionary)
+    follower.add("2020-01-01", "c")
+    assert follower.dtype == "category"
+    assert dictionary.categories == ["a", "b", "c"]
+
+
+def dtypes(state, name="status"):
+    return {state.space[key].controller[name].dtype for key in state.all_spaces}
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_spaces_share_the_string_dtype(workers, tmp_path):
+    frame = pd.DataFrame({"id": [2, 2, 3, 3, 4, 4], "date": pd.date_range("2020-01-01", periods=6, tz="UTC"),
+                          "status": ["x", "x", "x", "y", "x", "x"]})
+
+    added = State("id")
+    added.add({"id": 1, "date": "2020-01-01", "status": "a"})
+    added.include(frame, columns=["status"], workers=workers)
+    assert dtypes(added) == {"string"}
+
+    included = State("id")
+    included.include(frame, columns=["status"], workers=workers)
+    included.add({"id": 1, "date": "2020-01-01", "status": "a"})
+    assert dtypes(included) == {"category"}
+    assert included.space[1]["2020-01-02"]["status"] == "a"
+
+    included.save(tmp_path / "saved")
+    opened = State.open(tmp_path / "saved")
+    opened.add({"id": 5, "date": "2020-01-01", "status": "b"})
+    assert dtypes(opened) == {"category"}
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from stateful.storage.stream import Stream
+
+DATES = pd.date_range("2020-01-01", periods=12, freq="1d", tz="UTC")
+VALUES = ["started"] * 4 + ["ended"] * 6 + ["started"] * 2
+GRID = pd.date_range("2019-12-31", "2020-01-14", freq="12h", tz="UTC")
+
+
+def streams(backend, bulk):
+    result = []
+    for storage in ["events", "changes"]:
+        stream = Stream("status", configuration={"backend": backend, "storage": storage, "dtype": "string"})
+        if bulk:
+            stream.extend(DATES, VALUES)
+        else:
+            for date, value in zip(DATES, VALUES):
+                stream.add(date, value)
+        result.append(stream)
+
+    return result
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("bulk", [True, False])
+def test_changes_storage_matches_events(backend, bulk):
+    events, changes = streams(backend, bulk)
+
+    assert len(events) == len(changes) == 12
+    assert changes.end == events.end == DATES[-1]
+    assert changes.dates() == [DATES[0], DATES[4], DATES[10]]
+    assert list(changes.all(GRID).events) == list(events.all(GRID).events)
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_changes_storage_late_events(backend):
+    _, changes = streams(backend, bulk=False)
+
+    changes.add("2020-01-03 12:00", "ended")
+    changes.extend(["2020-01-15", "2020-01-16"], ["started", "ended"])
+
+    assert len(changes) == 15
+    assert changes.get("2020-01-03 13:00") == "ended"
+    assert changes.get("2020-01-15 12:00") == "started"
+    assert changes.last == "ended"
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from stateful.storage.columnar import ColumnarTree
+
+
+def test_columnar_inserts(columnar_state_empty):
+    state = columnar_state_empty
+    state.space[1].add({"date": "2020-12-10", "kind": "elf"})
+    state.space[1].add({"date": "2020-12-22", "can_make": "presents"})
+    state.space[1].add({"date": "2020-12-21", "amount": 4})
+    state.space[1].add({"date": "2020-12-22", "amount": 5})
+    state.space[1].add({"date": "2020-12-24", "amount": 100})
+
+    assert isinstance(state.space[1]["amount"]._stream.tree, ColumnarTree)
+    assert state.space[1].start == pd.to_datetime("2020-12-10", utc=True)
+    assert state.space[1].end == pd.to_datetime("2020-12-24", utc=True)
+    assert state.space[1]["amount"].first == 4
+    assert state.space[1]["amount"].last == 100
+
+    assert state.space[1]["2020-12-9"] == {"can_make": np.NaN, "kind": np.NaN, "amount": 0}
+    assert state.space[1]["2020-12-10"] == {"can_make": np.NaN, "kind": "elf", "amount": 0}
+    assert state.space[1][datetime(2020, 12, 22)] == {"can_make": "presents", "kind": "elf", "amount": 5}
+    assert state.space[1][datetime(2020, 12, 23)] == {"can_make": "presents", "kind": "elf", "amount": 52}
+
+
+def test_columnar_out_of_order():
+    tree = ColumnarTree("status", "string")
+    tree.add("2020-01-03", "ended")
+    tree.add("2020-01-01", "started")
+    tree.add("2020-01-02", "started")
+    tree.add("2020-01-02", "started")
+
+    assert len(tree) == 4
+    assert tree.get("2019-12-31") is np.NaN
+    assert tree.get("2020-01-02") == "started"
+    assert tree.get("2020-01-05") == "ended"
+    assert list(tree._change_values.data) == ["started", "ended"]
+
+    dates = pd.date_range("2019-12-31", "2020-01-04", freq="1d", tz="UTC")
+    column = tree.all(dates)
+    assert list(column.events[1:]) == ["started", "started", "ended", "ended"]
+    assert pd.isna(column.events[0])
+
+
+def test_columnar_backfill_keeps_head():
+    tree = ColumnarTree("amount", "integer")
+    tree.extend(pd.date_range("2020-01-01", periods=6, freq="1d", tz="UTC"), [1, 1, 2, 2, 3, 3])
+    head = tree._index.data[:2].copy()
+
+    tree.add("2020-01-04 12:00", 7)
+    tree.add("2020-01-05 06:00", 8)
+    tree.add("2020-01-03", 2)
+
+    assert len(tree) == 9
+    assert list(tree._index.data[:2]) == list(head)
+    assert list(tree._change_values.data) == [1, 2, 7, 3, 8, 3]
+
+    dates = pd.date_range("2020-01-01", "2020-01-07", freq="12h", tz="UTC")
+    assert list(tree.all(dates).events) == [1, 1, 1, 1, 2, 2, 2, 7, 3, 8, 3, 3, 3]
+
+
+def test_columnar_bad_value_fails_its_own_add():
+    tree = ColumnarTree("amount", "integer")
+    tree.add("2020-01-01", 1)
+
+    with pytest.raises(ValueError):
+        tree.add("2020-01-02", "oops")
+
+    tree.add("2020-01-03", 3)
+    assert len(tree) == 2
+    assert tree.get("2020-01-02") == 1
+    assert tree.get("2020-01-03") == 3
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful import State
+from stateful.storage.stream import Stream
+
+DATES = pd.date_range("2020-01-01", periods=96, freq="1h", tz="UTC")
+VALUES = np.arange(96, dtype=float)
+VALUES[5] = np.NaN
+
+
+def filled(backend, dtype="floating"):
+    stream = Stream("amount", configuration={"backend": backend, "dtype": dtype})
+    stream.extend(DATES, VALUES)
+    return stream
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("how, first", [("last", 23.0), ("mean", (sum(range(24)) - 5) / 23), ("max", 23.0)])
+def test_compact_old_history(backend, how, first):
+    stream = filled(backend)
+
+    assert stream.compact("2020-01-03", freq="1d", how=how) == 46
+    assert len(stream) == 50
+    assert stream.dates()[:3] == [DATES[23], DATES[47], DATES[48]]
+    assert stream.get("2020-01-01 23:00") == pytest.approx(first)
+    assert list(stream.all(DATES[48:]).events) == list(VALUES[48:])
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_compact_relative_and_appends(backend):
+    stream = filled(backend)
+
+    assert stream.compact(pd.Timedelta(1, unit="d"), freq="12h") == 71 - 6
+    assert stream.compact(pd.Timedelta(1, unit="d"), freq="12h") == 0
+
+    stream.add(DATES[-1] + pd.Timedelta(1, unit="h"), 1.0)
+    assert stream.get("2020-01-01 12:00") == 11.0
+    assert stream.last == 1.0
+
+
+def test_state_compact():
+    state = State("id")
+    for id in range(2):
+        for date, value in zip(DATES, VALUES):
+            state.add({"id": id, "date": date, "amount": value, "name": f"n{int(date.hour > 11)}"})
+
+    assert state.compact(pd.Timedelta(2, unit="d"), how={"amount": "max"}) == 4 * (47 - 2)
+    assert state.space[1]["2020-01-01 23:00"] == {"amount": 23.0, "name": "n1"}
+    assert state.space[1]["2020-01-03 03:00"] == {"amount": 51.0, "name": "n0"}
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_compacted_bucket_keeps_event_times(backend):
+    stream = Stream("status", configuration={"backend": backend, "dtype": "string"})
+    stream.add("2020-01-01 15:00", "open")
+    stream.add("2020-01-01 20:00", "closed")
+    stream.add("2020-01-03", "open")
+
+    assert stream.compact("2020-01-02", freq="1d", how="last") == 1
+    assert stream.start == pd.Timestamp("2020-01-01 20:00", tz="UTC")
+    assert stream.get("2020-01-01 10:00") is np.NaN
+    assert stream.get("2020-01-01 16:00") is np.NaN
+    assert stream.get("2020-01-01 21:00") == "closed"
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("how", ["last", "mean", "max"])
+@pytest.mark.parametrize("last", [1.0, np.NaN])
+def test_compact_keeps_reads_from_the_cutoff(backend, how, last):
+    start = pd.Timestamp("2020-01-01", tz="UTC")
+    stream = Stream("amount", configuration={"backend": backend, "dtype": "floating"})
+    stream.extend([start + pd.Timedelta(minutes) for minutes in ["61min", "71min", "77min", "105min"]],
+                  [5.0, 3.0, last, 2.0])
+    dates = [start + pd.Timedelta(minutes, unit="min") for minutes in [98, 100, 104, 105, 120]]
+    before = [str(stream.get(date)) for date in dates]
+
+    assert stream.compact(start + pd.Timedelta(98, unit="min"), freq="10min", how=how) == 1
+    assert [str(stream.get(date)) for date in dates] == before
+    assert str(stream.get(start + pd.Timedelta(90, unit="min"))) == str(last)
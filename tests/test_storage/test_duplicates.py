@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful.storage.stream import Stream
+
+DATES = ["2020-01-01", "2020-01-02", "2020-01-02", "2020-01-02", "2020-01-03"]
+VALUES = [1, 2, 3, 4, 5]
+
+
+def streams(backend, policy):
+    configuration = {"backend": backend, "on_dublicate": policy}
+
+    bulk = Stream("amount", configuration=dict(configuration))
+    bulk.extend(DATES, VALUES)
+
+    single = Stream("amount", configuration=dict(configuration))
+    for date, value in zip(DATES, VALUES):
+        single.add(date, value)
+
+    return bulk, single
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("policy, expected", [("first", 2), ("last", 4), ("sum", 9), ("count", 3)])
+def test_collapsing_policies(backend, policy, expected):
+    for stream in streams(backend, policy):
+        assert len(stream) == 3
+        assert stream.get("2020-01-02 12:00") == expected
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_increment_policy(backend):
+    for stream in streams(backend, "increment"):
+        assert len(stream) == 5
+        assert stream.get("2020-01-02") == 2
+        assert stream.get(pd.Timestamp("2020-01-02", tz="UTC") + pd.Timedelta(2, unit="ns")) == 4
+        assert stream.get("2020-01-02 12:00") == 4
+
+
+def test_increment_burst_stays_ordered():
+    stream = Stream("amount", configuration={"backend": "columnar"})
+    stream.extend(["2020-01-01"] * 1000, np.arange(1000))
+    stream.extend(["2020-01-01"] * 1000, np.arange(1000, 2000))
+
+    assert len(stream) == 2000
+    assert np.all(np.diff(stream.tree._index.data) == 1)
+    assert stream.last == 1999
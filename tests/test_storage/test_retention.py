@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+from stateful.storage.stream import Stream
+
+DATES = pd.date_range("2020-01-01", periods=30, freq="1d", tz="UTC")
+VALUES = [i // 4 for i in range(30)]
+
+
+def filled(configuration, bulk):
+    stream = Stream("amount", configuration=dict(configuration, dtype="integer"))
+    if bulk:
+        stream.extend(DATES, VALUES)
+    else:
+        for date, value in zip(DATES, VALUES):
+            stream.add(date, value)
+
+    return stream
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("bulk", [True, False])
+def test_max_events(backend, bulk):
+    stream = filled({"backend": backend, "max_events": 10}, bulk)
+
+    assert len(stream) == 10
+    assert stream.dates() == list(DATES[-10:])
+    assert stream.get(DATES[20]) == VALUES[20]
+    assert stream.get(DATES[19]) == 0
+    assert list(stream.all(DATES[20:]).events) == VALUES[20:]
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("bulk", [True, False])
+def test_retention_drops_old_events(backend, bulk):
+    stream = filled({"backend": backend, "retention": "7d"}, bulk)
+
+    assert stream.dates() == list(DATES[-8:])
+    assert stream.get(DATES[21]) == 0
+    assert stream.get(DATES[-1] + pd.Timedelta(1, unit="d")) == VALUES[-1]
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("bulk", [True, False])
+def test_retention_keeps_baseline(backend, bulk):
+    stream = filled({"backend": backend, "retention": "7d 12h", "baseline": True}, bulk)
+    grid = pd.date_range(DATES[22] - pd.Timedelta(12, unit="h"), DATES[-1], freq="6h")
+
+    assert stream.dates() == list(DATES[-9:])
+    assert list(stream.all(grid).events) == [VALUES[(date - DATES[0]).days] for date in grid]
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_late_event_moves_baseline(backend):
+    stream = filled({"backend": backend, "retention": "7d 12h", "baseline": True}, bulk=False)
+
+    stream.add(DATES[21] + pd.Timedelta(6, unit="h"), 100)
+    stream.add(DATES[2], 200)
+
+    assert len(stream) == 9
+    assert stream.dates()[0] == DATES[21] + pd.Timedelta(6, unit="h")
+    assert stream.get(DATES[22] - pd.Timedelta(1, unit="h")) == 100
+    assert stream.get(DATES[22]) == VALUES[22]
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("configuration", [{"max_events": 10}, {"retention": "7d"},
+                                           {"retention": "7d 12h", "baseline": True}])
+def test_batches_after_the_end_are_appended(backend, configuration, monkeypatch):
+    configuration = dict(configuration, backend=backend)
+    expected = filled(configuration, bulk=False)
+    stream = filled(configuration, bulk=False)
+
+    # a retained stream evicts after the append like add does, it is not rebuilt
+    monkeypatch.setattr(type(stream.tree), "_rebuild", lambda *_: pytest.fail("the stream was rebuilt"))
+    later = pd.date_range(DATES[-1] + pd.Timedelta(1, unit="d"), periods=30, freq="1d", tz="UTC")
+    values = [8 + i // 4 for i in range(30)]
+    stream.extend(later[:15], values[:15])
+    stream.extend(later[15:], values[15:])
+    for date, value in zip(later, values):
+        expected.add(date, value)
+
+    assert stream.dates() == expected.dates()
+    grid = pd.date_range(DATES[0], later[-1], freq="12h")
+    assert list(stream.all(grid).events.astype(str)) == list(expected.all(grid).events.astype(str))
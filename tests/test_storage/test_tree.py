@@ -0,0 +1,29 @@
+import pandas as pd
+from stateful.storage.tree import DateTree
+
+
+def test_all_matches_get():
+    tree = DateTree("status", "string", index=[pd.to_datetime("2020-01-02", utc=True)], values=["started"])
+    tree.add("2020-01-05", "ended")
+    tree.add("2020-01-04", "started")
+    tree.add("2020-02-01", "started")
+
+    dates = pd.date_range("2020-01-01", "2020-02-03", freq="1d", tz="UTC")
+    column = tree.all(dates)
+
+    assert pd.isna(column.events[0])
+    assert list(column.events[1:]) == [tree.get(date) for date in dates[1:]]
+
+
+def test_linear_all_matches_get():
+    tree = DateTree("amount", "integer", index=[pd.to_datetime("2020-01-02", utc=True)], values=[0],
+                    interpolation="linear")
+    tree.add("2020-01-06", 100)
+    tree.add("2020-01-04", 10)
+
+    assert not hasattr(tree, "_backup_index")
+    assert tree.get("2020-01-03") == 5
+    assert tree.get("2020-01-05") == 55
+
+    dates = pd.date_range("2020-01-01", "2020-01-07", freq="12h", tz="UTC")
+    assert list(tree.all(dates).events) == [tree.get(date) for date in dates]
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stateful.storage.stream import Stream
+
+DATES = ["2020-01-01", "2020-01-02", "2020-01-03", "2020-01-04"]
+GRID = pd.date_range("2020-01-01", "2020-01-04", freq="1d", tz="UTC")
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("bulk", [True, False])
+def test_large_integers_are_exact(backend, bulk):
+    values = [2 ** 53 + 1, 2 ** 62 + 3, 16777217, 7]
+
+    stream = Stream("amount", configuration={"backend": backend})
+    if bulk:
+        stream.extend(DATES, values)
+    else:
+        for date, value in zip(DATES, values):
+            stream.add(date, value)
+
+    assert stream.get("2020-01-01") == 2 ** 53 + 1
+    assert stream.get("2020-01-03 12:00") == 16777217
+
+    events = stream.all(GRID).events
+    assert events.dtype == np.int64
+    assert list(events) == values
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+@pytest.mark.parametrize("bulk", [True, False])
+def test_missing_values_are_masked(backend, bulk):
+    values = [3, np.NaN, np.NaN, 0]
+
+    stream = Stream("amount", configuration={"backend": backend})
+    if bulk:
+        stream.extend(DATES, values)
+    else:
+        for date, value in zip(DATES, values):
+            stream.add(date, value)
+
+    assert stream.get("2020-01-01") == 3
+    assert np.isnan(stream.get("2020-01-02 12:00"))
+    assert stream.get("2020-01-05") == 0
+
+    events = stream.all(GRID).events
+    assert np.isnan(events[1]) and np.isnan(events[2])
+    assert list(events[[0, 3]]) == [3, 0]
+
+
+@pytest.mark.parametrize("backend", ["tree", "columnar"])
+def test_booleans_stay_booleans(backend):
+    stream = Stream("can_make", configuration={"backend": backend})
+    stream.extend(DATES, [True, False, False, True])
+
+    assert stream.get("2020-01-02") is False
+    assert stream.all(GRID).events.dtype == bool